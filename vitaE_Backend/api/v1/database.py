@@ -1,21 +1,155 @@
 #!/usr/bin/python3
 """Module for database connections and session management"""
 import os
+import threading
+from fastapi import FastAPI
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from models import Base
 from models.comment import Comment
+from models.email_outbox import EmailOutbox
+from models.explore_seen import ExploreSeen
 from models.post import Post
 from models.post_like import PostLike
+from models.post_score import PostScore
+from models.timeline import Timeline
 from models.user import User
 from models.user_following import UserFollowing
+from models.user_stats import UserStats
+from models.user_suggestion import UserSuggestion, SuggestionQueue
+
+from .utils.metrics import incr_counter, register_gauge
+
+
+_engine = None
+_session_factory = None
+_async_engine = None
+_async_session_factory = None
+_engine_lock = threading.Lock()
+
+
+def get_pool_settings():
+    """Get connection pool settings from the environment"""
+    pool_settings = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_pre_ping': True
+    }
+    return pool_settings
+
+
+def track_pool_metrics(engine, prefix: str):
+    """Record connection pool events and usage of an engine"""
+    def on_connect(dbapi_conn, conn_record):
+        incr_counter(f'{prefix}.connects')
+
+    def on_checkout(dbapi_conn, conn_record, conn_proxy):
+        incr_counter(f'{prefix}.checkouts')
+
+    def on_checkin(dbapi_conn, conn_record):
+        incr_counter(f'{prefix}.checkins')
+
+    def on_invalidate(dbapi_conn, conn_record, exception):
+        incr_counter(f'{prefix}.invalidations')
+
+    event.listen(engine, 'connect', on_connect)
+    event.listen(engine, 'checkout', on_checkout)
+    event.listen(engine, 'checkin', on_checkin)
+    event.listen(engine, 'invalidate', on_invalidate)
+    pool = engine.pool
+    register_gauge(f'{prefix}.size', pool.size)
+    register_gauge(f'{prefix}.checked_out', pool.checkedout)
+    register_gauge(f'{prefix}.overflow', pool.overflow)
 
 
 def get_engine():
-    """Create and get database engine"""
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url, pool_pre_ping=True)
-    return engine
+    """Get the process-wide database engine, creating it once"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                db_url = os.getenv('DATABASE_URL')
+                engine = create_engine(db_url, **get_pool_settings())
+                track_pool_metrics(engine, 'db.pool')
+                _engine = engine
+    return _engine
+
+
+def get_session_factory():
+    """Get the process-wide session factory bound to the engine"""
+    global _session_factory
+    if _session_factory is None:
+        engine = get_engine()
+        with _engine_lock:
+            if _session_factory is None:
+                _session_factory = sessionmaker(
+                    autocommit=False,
+                    autoflush=False,
+                    bind=engine
+                )
+    return _session_factory
+
+
+def get_async_url():
+    """Get database URL using the asyncpg driver"""
+    db_url = os.getenv('ASYNC_DATABASE_URL') or os.getenv('DATABASE_URL')
+    url = make_url(db_url)
+    if url.drivername in ('postgresql', 'postgresql+psycopg2'):
+        url = url.set(drivername='postgresql+asyncpg')
+    return url
+
+
+def get_async_engine():
+    """Get the process-wide async database engine, creating it once"""
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                engine = create_async_engine(
+                    get_async_url(), **get_pool_settings())
+                track_pool_metrics(engine.sync_engine, 'db.async_pool')
+                _async_engine = engine
+    return _async_engine
+
+
+def get_async_session_factory():
+    """Get the process-wide async session factory bound to the engine"""
+    global _async_session_factory
+    if _async_session_factory is None:
+        engine = get_async_engine()
+        with _engine_lock:
+            if _async_session_factory is None:
+                _async_session_factory = async_sessionmaker(
+                    bind=engine,
+                    autoflush=False,
+                    expire_on_commit=False
+                )
+    return _async_session_factory
+
+
+async def get_db_session():
+    """Yield an async session for the duration of a request"""
+    AsyncSessionLocal = get_async_session_factory()
+    async with AsyncSessionLocal() as db_session:
+        yield db_session
+
+
+async def init_async_engine():
+    """Build the async engine and session factory and create tables"""
+    engine = get_async_engine()
+    get_async_session_factory()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_async_engine():
+    """Close all pooled connections of the async engine"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
 
 
 def init_database():
@@ -27,8 +161,12 @@ def init_database():
 
 def get_session():
     """Get new SQLAlchemy session"""
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(engine)
+    SessionLocal = get_session_factory()
     session = SessionLocal()
     return session
+
+
+def config_database(app: FastAPI):
+    """Set up database engine creation and disposal with the app"""
+    app.add_event_handler('startup', init_async_engine)
+    app.add_event_handler('shutdown', dispose_async_engine)
@@ -3,7 +3,14 @@
 from fastapi import FastAPI
 
 from .endpoints import (
-    endpoint_home, authentication, user, connection, post, comment, search
+    endpoint_home,
+    authentication,
+    user,
+    connection,
+    post,
+    comment,
+    search,
+    suggestion
 )
 
 
@@ -15,4 +22,5 @@ def config_endpoints(app: FastAPI):
     app.include_router(connection.endpoint)
     app.include_router(post.endpoint)
     app.include_router(search.endpoint)
+    app.include_router(suggestion.endpoint)
     app.include_router(user.endpoint)
@@ -5,6 +5,8 @@ from starlette.responses import FileResponse
 from fastapi import APIRouter
 from imagekitio import ImageKit
 
+from ..utils.metrics import metrics_snapshot
+
 
 endpoint_home = APIRouter()
 
@@ -35,6 +37,23 @@ async def serve_favicon():
     return favicon_content
 
 
+@endpoint_home.get('/api/v1/metrics')
+async def get_metrics(key=''):
+    """Getting and return process metrics for operators"""
+    api_response = {
+        'success': False,
+        'message': 'Invalid metrics key.'
+    }
+    metrics_key = os.getenv('APP_METRICS_KEY', '')
+    if not metrics_key or key != metrics_key:
+        return api_response
+    api_response = {
+        'success': True,
+        'data': metrics_snapshot()
+    }
+    return api_response
+
+
 @endpoint_home.get('/api/v1/profile-picture')
 async def get_profile_picture(imge_id: str):
     """Getting and return profile ficture for user"""
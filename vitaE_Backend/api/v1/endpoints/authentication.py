@@ -4,8 +4,9 @@ import os
 import uuid
 import argon2
 import email_validator
-from sqlalchemy import and_
-from fastapi import APIRouter
+from sqlalchemy import and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Request
 from datetime import datetime
 
 from ..form_types import (
@@ -14,89 +15,120 @@ from ..form_types import (
     PasswordResetModel,
     PasswordResetRequestModel
 )
-from ..database import get_session, User
-from ..utils.token_management import AuthTokenMngr, ResetTokenMngr
+from ..database import get_db_session, User, UserStats
+from ..utils.token_management import (
+    AuthTokenMngr, ResetTokenMngr, auth_token_cache)
+from ..utils.invalidation import publish
+from ..utils.signin_limiter import signin_limiter
+from ..utils.passwords import (
+    PasswordPoolBusy, hash_password, verify_password)
 from ..utils.html_template_processor import html_template_render
-from ..utils.mailing import deliver_message
+from ..utils.mailing import queue_message
+from ..workers.email_outbox import email_delivery
 
 
 endpoint = APIRouter(prefix='/api/v1')
 
 
 @endpoint.post('/sign-in')
-async def sign_in(body: SignInModel):
+async def sign_in(body: SignInModel, request: Request,
+                  db_session: AsyncSession = Depends(get_db_session)):
     """Verify user signin and generate an authentication token"""
     api_response = {
         'success': False,
         'message': 'Failed user authentication.'
     }
-    db_session = get_session()
     try:
         email_validator.validate_email(body.email)
-        user = db_session.query(User).filter(User.email == body.email).first()
-        if user:
-            max_login_attempts = int(os.getenv('APP_MAX_SIGNIN'))
-            try:
-                if user.signin_attempts >= max_login_attempts:
-                    return api_response
-                hashpwd = argon2.PasswordHasher()
-                hashpwd.verify(user.hashed_password, body.password)
-                if user.signin_attempts > 1:
-                    db_session.query(User).filter(
-                        user.email == body.email
-                    ).update(
-                        {
-                            User.updated_on: datetime.utcnow(),
-                            User.signin_attempts: 1
-                        },
-                        synchronize_session=False
+        max_login_attempts = int(os.getenv('APP_MAX_SIGNIN'))
+        max_ip_attempts = int(os.getenv('SIGNIN_MAX_PER_IP', '50'))
+        email_key = signin_limiter.email_key(body.email)
+        ip_key = signin_limiter.ip_key(
+            request.client.host if request.client else '')
+        limited = (
+            signin_limiter.is_limited(ip_key, max_ip_attempts) or
+            signin_limiter.is_limited(email_key, max_login_attempts)
+        )
+        if limited:
+            api_response['message'] = 'Too many sign in attempts.'
+            return api_response
+        user = await db_session.scalar(
+            select(User).where(User.email == body.email))
+        if not user:
+            signin_limiter.hit(ip_key)
+            return api_response
+        try:
+            if user.signin_attempts >= max_login_attempts:
+                return api_response
+            valid_password, new_hash = await verify_password(
+                user.hashed_password, body.password)
+            if not valid_password:
+                raise argon2.exceptions.VerifyMismatchError()
+            signin_limiter.reset(email_key)
+            user_values = {}
+            if user.signin_attempts > 1:
+                user_values['signin_attempts'] = 1
+            if new_hash:
+                user_values['hashed_password'] = new_hash
+            if user_values:
+                await db_session.execute(
+                    update(User).where(User.email == body.email).values(
+                        updated_on=datetime.utcnow(),
+                        **user_values
                     )
-                    db_session.commit()
-                auth_token = AuthTokenMngr(
-                    user_id=user.id,
-                    email=user.email,
-                    secure_text=user.hashed_password
                 )
-                api_response = {
-                    'success': True,
-                    'data': {
-                        'userId': user.id,
-                        'name': user.name,
-                        'authToken': AuthTokenMngr.encode_token(auth_token)
-                    }
+                await db_session.commit()
+            auth_token = AuthTokenMngr(
+                user_id=user.id,
+                email=user.email,
+                token_version=user.token_version
+            )
+            api_response = {
+                'success': True,
+                'data': {
+                    'userId': user.id,
+                    'name': user.name,
+                    'authToken': AuthTokenMngr.encode_token(auth_token)
                 }
-            except argon2.exceptions.VerificationError:
-                active_account = user.user_active
-                if user.signin_attempts + 1 == max_login_attempts:
-                    active_account = False
-                db_session.query(User).filter(User.email == body.email).update(
-                    {
-                        User.updated_on: datetime.utcnow(),
-                        User.signin_attempts: user.signin_attempts + 1,
-                        User.user_active: active_account
-                    },
-                    synchronize_session=False
+            }
+        except argon2.exceptions.VerificationError:
+            signin_limiter.hit(ip_key)
+            failures = signin_limiter.hit(email_key)
+            if failures < max_login_attempts or not user.user_active:
+                return api_response
+            await db_session.execute(
+                update(User).where(User.email == body.email).values(
+                    updated_on=datetime.utcnow(),
+                    signin_attempts=max_login_attempts,
+                    user_active=False,
+                    token_version=User.token_version + 1
                 )
-                db_session.commit()
-                if not active_account:
-                    deliver_message(
-                        body.email,
-                        'Your account has been locked',
-                        html_template_render(
-                            'locked_account',
-                            name=user.name
-                        )
-                    )
+            )
+            await publish(db_session, 'auth_user', user.id)
+            queue_message(
+                db_session,
+                body.email,
+                'Your account has been locked',
+                html_template_render(
+                    'locked_account',
+                    name=user.name
+                )
+            )
+            await db_session.commit()
+            email_delivery.wake()
+            signin_limiter.reset(email_key)
+            auth_token_cache.invalidate_user(user.id)
+    except PasswordPoolBusy:
+        api_response['message'] = 'Server is busy, try again later.'
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.post('/sign-up')
-async def sign_up(body: SignUpModel):
+async def sign_up(body: SignUpModel,
+                  db_session: AsyncSession = Depends(get_db_session)):
     """Sign up new user and send welcome email"""
     api_response = {
         'success': False,
@@ -107,18 +139,8 @@ async def sign_up(body: SignUpModel):
         if len(body.name) > 64:
             api_response['message'] = 'User name is too long.'
             return api_response
-        db_session = get_session()
-        hashpwd = argon2.PasswordHasher()
         try:
-            deliver_message(
-                body.email,
-                'Welcome to Vita Experientia',
-                html_template_render(
-                    'welcome',
-                    name=body.name
-                )
-            )
-            phash = hashpwd.hash(body.password)
+            phash = await hash_password(body.password)
             gen_id = str(uuid.uuid4())
             currnttime = datetime.utcnow()
             new_user = User(
@@ -130,11 +152,22 @@ async def sign_up(body: SignUpModel):
                 hashed_password=phash
             )
             db_session.add(new_user)
-            db_session.commit()
+            db_session.add(UserStats(user_id=gen_id, updated_on=currnttime))
+            queue_message(
+                db_session,
+                body.email,
+                'Welcome to Vita Experientia',
+                html_template_render(
+                    'welcome',
+                    name=body.name
+                )
+            )
+            await db_session.commit()
+            email_delivery.wake()
             auth_token = AuthTokenMngr(
                 user_id=gen_id,
                 email=body.email,
-                secure_text=phash
+                token_version=0
             )
             api_response = {
                 'success': True,
@@ -144,32 +177,33 @@ async def sign_up(body: SignUpModel):
                     'authToken': AuthTokenMngr.encode_token(auth_token)
                 }
             }
+        except PasswordPoolBusy:
+            api_response['message'] = 'Server is busy, try again later.'
         except Exception as ex:
             print(ex.args[0])
-            db_session.rollback()
+            await db_session.rollback()
             api_response = {
                 'success': False,
                 'message': 'Account creation failed.'
             }
-        db_session.close()
     except email_validator.EmailNotValidError:
         api_response['message'] = 'Invalid email.'
     return api_response
 
 
 @endpoint.post('/reset-password')
-async def request_reset_password(body: PasswordResetRequestModel):
+async def request_reset_password(
+        body: PasswordResetRequestModel,
+        db_session: AsyncSession = Depends(get_db_session)):
     """Get password reset token and send reset email"""
     api_response = {
         'success': False,
         'message': 'Token creation reset failed.'
     }
-    db_session = get_session()
     try:
         email_validator.validate_email(body.email)
-        queryres = db_session.query(User).filter(
-            User.email == body.email
-        ).first()
+        queryres = await db_session.scalar(
+            select(User).where(User.email == body.email))
         if queryres:
             reset_token = ResetTokenMngr(
                 user_id=queryres.id,
@@ -177,21 +211,16 @@ async def request_reset_password(body: PasswordResetRequestModel):
                 message='password_reset'
             )
             reset_token_str = ResetTokenMngr.encode_token(reset_token)
-            db_session.query(User).filter(and_(
-                User.id == queryres.id,
-                User.email == body.email
-            )).update(
-                {
-                    User.user_reset_token: reset_token_str
-                },
-                synchronize_session=False
+            await db_session.execute(
+                update(User).where(and_(
+                    User.id == queryres.id,
+                    User.email == body.email
+                )).values(
+                    user_reset_token=reset_token_str
+                )
             )
-            db_session.commit()
-            api_response = {
-                'success': True,
-                'data': {}
-            }
-            deliver_message(
+            queue_message(
+                db_session,
                 body.email,
                 'Reset Your Password',
                 html_template_render(
@@ -200,29 +229,33 @@ async def request_reset_password(body: PasswordResetRequestModel):
                     token=reset_token_str
                 )
             )
+            await db_session.commit()
+            email_delivery.wake()
+            api_response = {
+                'success': True,
+                'data': {}
+            }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.put('/reset-password')
-async def reset_password(body: PasswordResetModel):
+async def reset_password(body: PasswordResetModel,
+                         db_session: AsyncSession = Depends(get_db_session)):
     """User password using reset token updated"""
     api_response = {
         'success': False,
         'message': 'Password reset failed.'
     }
-    db.session = get_session()
     try:
         email_validator.validate_email(body.email)
-        user = db_session.query(User).filter(
-            User.email == body.email
-        ).first()
-        reset_token = ResetTokenMngr.convert_token(body.resetToken)
-        if not reset_token:
+        user = await db_session.scalar(
+            select(User).where(User.email == body.email))
+        reset_token = await ResetTokenMngr.convert_token(
+            body.resetToken, db_session)
+        if not user or not reset_token:
             return api_response
         if reset_token.has_expired():
             api_response = {
@@ -230,29 +263,38 @@ async def reset_password(body: PasswordResetModel):
                 'message': 'Reset password token has expired.'
             }
             return api_response
-        valid_condts[
+        valid_condts = [
             reset_token.email == body.email,
             len(body.password.strip()) > 8,
             reset_token.message == 'password_reset'
         ]
         if all(valid_condts):
-            hashpwd = argon2.PasswordHasher()
-            phash = hashpwd(body.password)
-            db_session.query(User).filter(
-                User.email == body.email
-            ).update(
-                {
-                    User.hashed_password: phash,
-                    User.user_reset_token: '',
-                    User.signin_attempts: 1
-                },
-                synchronize_session=False
+            phash = await hash_password(body.password)
+            token_version = await db_session.scalar(
+                update(User).where(User.email == body.email).values(
+                    hashed_password=phash,
+                    user_reset_token='',
+                    signin_attempts=1,
+                    token_version=User.token_version + 1
+                ).returning(User.token_version)
             )
-            db_session.commit()
+            await publish(db_session, 'auth_user', user.id)
+            queue_message(
+                db_session,
+                body.email,
+                'Your Password Has Been Changed',
+                html_template_render(
+                    'password_changed',
+                    name=user.name
+                )
+            )
+            await db_session.commit()
+            email_delivery.wake()
+            auth_token_cache.invalidate_user(user.id)
             auth_token = AuthTokenMngr(
                 user_id=user.id,
                 email=body.email,
-                secure_text=phash
+                token_version=token_version
             )
             api_response = {
                 'success': True,
@@ -262,17 +304,9 @@ async def reset_password(body: PasswordResetModel):
                     'authToken': AuthTokenMngr.encode_token(auth_token)
                 }
             }
-            deliver_message(
-                body.email,
-                'Your Password Has Been Changed',
-                html_template_render(
-                    'password_changed',
-                    name=user.name
-                )
-            )
+    except PasswordPoolBusy:
+        api_response['message'] = 'Server is busy, try again later.'
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
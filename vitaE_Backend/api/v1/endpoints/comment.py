@@ -1,63 +1,125 @@
 #!/usr/bin/python3
 """Module for endpoints management for comment on post"""
-import re
 import uuid
-from sqlalchemy import and_
+from collections import Counter
+from sqlalchemy import and_, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from ..utils.navigation import paginate_list
-from ..database import get_session, User, Comment
+from ..utils.navigation import parse_span, keyset_select, keyset_page
+from ..database import get_db_session, Comment, Post
 from ..form_types import CommentAddModel, CommentDeleteModel
 from ..utils.token_management import AuthTokenMngr
+from ..utils.counters import shift_user_stats_stmt
+from ..utils.user_summaries import UserSummary, user_summaries
+from ..utils.comment_threads import (
+    MAX_THREAD_DEPTH,
+    subtree_cte,
+    nested_replies_query,
+    nest_replies
+)
 
 
 endpoint = APIRouter(prefix='/api/v1')
 
 
+def comment_details(comment: Comment, user: UserSummary):
+    """Create and return details of a comment and its author"""
+    comment_info = {
+        'id': comment.id,
+        'user': {
+            'id': user.id,
+            'name': user.name,
+            'profilePictureId': user.profile_picture_id
+        },
+        'createdOn': comment.created_on.isoformat(),
+        'text': comment.content,
+        'postId': comment.post_id,
+        'repliesCount': comment.replies_count,
+        'replyTo': comment.comment_id if comment.comment_id else ''
+    }
+    return comment_info
+
+
+async def get_comments_page(db_session: AsyncSession, condition, span,
+                            after, before, api_response, depth=''):
+    """Create and return a page of comments matching a condition"""
+    span = parse_span(span)
+    if span is None:
+        api_response = {
+            'success': False,
+            'message': 'Invalid span type.'
+        }
+        return api_response
+    depth = depth.strip() if depth else ''
+    if depth and not depth.isdigit():
+        api_response = {
+            'success': False,
+            'message': 'Invalid depth type.'
+        }
+        return api_response
+    depth = min(int(depth or '0'), MAX_THREAD_DEPTH)
+    try:
+        comments_query = keyset_select(
+            select(Comment).where(condition),
+            Comment.created_on, Comment.id, span, after, before,
+            descending=False
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    comments, next_cursor, prev_cursor = keyset_page(
+        (await db_session.scalars(comments_query)).all(), span, after,
+        before
+    )
+    replies = []
+    if depth and comments:
+        replies = (await db_session.scalars(nested_replies_query(
+            [comment.id for comment in comments], depth
+        ))).all()
+    authors = await user_summaries.get_many(
+        db_session, [comment.user_id for comment in [*comments, *replies]])
+    comments_data = [
+        comment_details(comment, authors[comment.user_id])
+        for comment in comments if comment.user_id in authors
+    ]
+    if replies:
+        nest_replies(comments_data, replies, authors, comment_details)
+    api_response = {
+        'success': True,
+        'data': comments_data,
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
+    return api_response
+
+
 @endpoint.get('/comment')
-async def get_comment(id=''):
+async def get_comment(id='',
+                      db_session: AsyncSession = Depends(get_db_session)):
     """Create and return details if a certain comment"""
     api_response = {
         'success': False,
         'message': 'Comment not found.'
     }
-    db_session = get_session()
-    try:
-        comment = db_session.query(Comment).filter(Comment.id == id).first()
-        if comment:
-            user = db_session.query(User).filter(
-                User.id == comment.user_id
-            ).first()
-            if not user:
-                return api_response
-            comnt_rep = db_session.query(Comment).filter(
-                Comment.comment_id == comment.id
-            ).all()
-            replies_c = len(comnt_rep) if comnt_rep else 0
-            api_response = {
-                'success': True,
-                'data': {
-                    'id': comment.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'createdOn': comment.created_on.isoformat(),
-                    'text': comment.content,
-                    'postId': comment.post_id,
-                    'repliesCount': replies_c,
-                    'replyTo': comment.comment_id if comment.comment_id else ''
-                }
-            }
-    finally:
-        db_session.close()
+    comment = await db_session.scalar(select(Comment).where(Comment.id == id))
+    if comment:
+        authors = await user_summaries.get_many(
+            db_session, [comment.user_id])
+        if comment.user_id not in authors:
+            return api_response
+        api_response = {
+            'success': True,
+            'data': comment_details(comment, authors[comment.user_id])
+        }
     return api_response
 
 
 @endpoint.get('/comments-of-post')
-async def get_post_comments(id='', span='', after='', before=''):
+async def get_post_comments(
+        id='', span='', after='', before='', depth='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return all comments made under a post"""
     api_response = {
         'success': False,
@@ -65,69 +127,17 @@ async def get_post_comments(id='', span='', after='', before=''):
     }
     if not id:
         return api_response
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        comments = db_session.query(Comment).filter(and_(
-            Comment.post_id == id,
-            Comment.comment_id == None
-        )).all()
-        comments_data = []
-        if comments:
-            for comment in comments:
-                user = db_session.query(User).filter(
-                    User.id == comment.user_id
-                ).first()
-                if not user:
-                    continue
-                comnt_reps = db_session.query(Comment).filter(and_(
-                    Comment.post_id == id,
-                    Comment.comment_id == comment.id
-                )).all()
-                replies_c = len(comnt_reps) if comnt_reps else 0
-                comment_info = {
-                    'id': comment.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'createdOn': comment.created_on.isoformat(),
-                    'text': comment.content,
-                    'postId': comment.post_id,
-                    'repliesCount': replies_c,
-                    'replyTo': comment.comment_id if comment.comment_id else ''
-                }
-                comments_data.append(comment_info)
-        comments_data.sort(
-            key=lambda x: datetime.fromisoformat(x['createdOn'])
-        )
-        api_response = {
-            'success': True,
-            'data': paginate_list(
-                comments_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
-        }
-    finally:
-        db_session.close()
-    return api_response
+    return await get_comments_page(
+        db_session,
+        and_(Comment.post_id == id, Comment.comment_id == None),
+        span, after, before, api_response, depth
+    )
 
 
 @endpoint.get('/comment-replies')
-async def get_comment_replies(id='', span='', after='', before=''):
+async def get_comment_replies(
+        id='', span='', after='', before='', depth='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return the replies to a certain comment"""
     api_response = {
         'success': False,
@@ -135,68 +145,16 @@ async def get_comment_replies(id='', span='', after='', before=''):
     }
     if not id:
         return api_response
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        comments = db_session.query(Comment).filter(
-            Comment.comment_id == id
-        ).all()
-        replies_data = []
-        if comments:
-            for comment in comments:
-                user = db_session.query(User).filter(
-                    User.id == comment.user_id
-                ).first()
-                if not user:
-                    continue
-                comnt_reps = db_session.query(Comment).filter(and_(
-                    Comment.post_id == id,
-                    Comment.comment_id == comment.id
-                )).all()
-                replies_c = len(comnt_reps) if comnt_reps else 0
-                replies_info = {
-                    'id': comment.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'createdOn': comment.created_on.isoformat(),
-                    'text': comment.content,
-                    'postId': comment.post_id,
-                    'repliesCount': replies_c,
-                    'replyTo': comment.comment_id if comment.comment_id else ''
-                }
-                replies_data.append(replies_info)
-        replies_data.sort(
-            key=lambda x: datetime.fromisoformat(x['createdOn'])
-        )
-        api_response = {
-            'success': True,
-            'data': paginate_list(
-                replies_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
-        }
-    finally:
-        db_session.close()
-    return api_response
+    return await get_comments_page(
+        db_session, Comment.comment_id == id,
+        span, after, before, api_response, depth
+    )
 
 
 @endpoint.get('/comments-by-user')
-async def get_user_comments(id='', span='', after='', before=''):
+async def get_user_comments(
+        id='', span='', after='', before='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return all comments by a certain user"""
     api_response = {
         'success': False,
@@ -208,86 +166,33 @@ async def get_user_comments(id='', span='', after='', before=''):
         'success': False,
         'message': 'User comment not found.'
     }
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            return api_response
-        span = int(span if span else '12')
-        user = db_session.query(User).filter(User.id == id).first()
-        if not user:
-            return api_response
-        comments = db_session.query(Comment).filter(
-            Comment.user_id == id
-        ).all()
-        comments_data = []
-        if comments:
-            for comment in comments:
-                comnt_reps = db_session.query(Comment).filter(
-                    Comment.comment_id == comment.id
-                ).all()
-                replies_c = len(comnt_reps) if comnt_reps else 0
-                comments_info = {
-                    'id': comment.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'createdOn': comment.created_on.isoformat(),
-                    'text': comment.content,
-                    'postId': comment.post_id,
-                    'repliesCount': replies_c,
-                    'replyTo': comment.comment_id if comment.comment_id else ''
-                }
-                comments_data.append(comments_info)
-        comments_data.sort(
-            key=lambda x: datetime.fromisoformat(x['createdOn'])
-        )
-        api_response = {
-            'success': True,
-            'data': paginate_list(
-                comments_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
-        }
-    finally:
-        db_session.close()
-    return api_response
+    return await get_comments_page(
+        db_session, Comment.user_id == id,
+        span, after, before, api_response
+    )
 
 
 @endpoint.post('/comment')
-async def create_comment(body: CommentAddModel):
+async def create_comment(body: CommentAddModel,
+                         db_session: AsyncSession = Depends(get_db_session)):
     """Generates and adds a new comment to a post"""
     api_response = {
         'success': False,
         'message': 'Failed to add comment.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
     if len(body.content) > 384:
         api_response['message'] = 'Comment is too long.'
         return api_response
-    db_session = get_session()
     try:
         reply_id = body.replyTo.strip() if body.replyTo else None
         if reply_id:
-            queryres = db_session.query(Comment).filter(and_(
-                Comment.id == reply_id,
-                Comment.comment_id == None
-            )).first()
+            queryres = await db_session.scalar(
+                select(Comment).where(Comment.id == reply_id))
             if not queryres or queryres.post_id != body.postId:
-                db_session.close()
                 return api_response
         gen_id = str(uuid.uuid4())
         currntdt = datetime.utcnow()
@@ -300,7 +205,21 @@ async def create_comment(body: CommentAddModel):
             content=body.content
         )
         db_session.add(comment)
-        db_session.commit()
+        if reply_id:
+            await db_session.execute(
+                update(Comment).where(Comment.id == reply_id).values(
+                    replies_count=Comment.replies_count + 1
+                )
+            )
+        else:
+            await db_session.execute(
+                update(Post).where(Post.id == body.postId).values(
+                    comments_count=Post.comments_count + 1
+                )
+            )
+        await db_session.execute(
+            shift_user_stats_stmt(body.userId, comments_count=1))
+        await db_session.commit()
         api_response = {
             'success': True,
             'data': {
@@ -313,40 +232,58 @@ async def create_comment(body: CommentAddModel):
         }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.delete('/comment')
-async def delete_comment(body: CommentDeleteModel):
+async def delete_comment(body: CommentDeleteModel,
+                         db_session: AsyncSession = Depends(get_db_session)):
     """Delete certain comment from a post"""
     api_response = {
         'success': False,
         'message': 'Comment delete failesd.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
-    db_session = get_session()
     try:
-        db_session.query(Comment).filter(
-            Comment.comment_id == body.commentId
-        ).delete(
-            synchronize_session=False
-        )
-        db_session.query(Comment).filter(
-            Comment.id == body.commentId
-        ).delete(
-            synchronize_session=False
-        )
-        db_session.commit()
+        comment = await db_session.scalar(select(Comment).where(and_(
+            Comment.id == body.commentId,
+            Comment.user_id == body.userId
+        )).with_for_update())
+        if not comment:
+            return api_response
+        subtree = subtree_cte(Comment.id == comment.id)
+        deleted_by = Counter((await db_session.scalars(
+            delete(Comment).where(
+                Comment.id.in_(select(subtree.c.id))
+            ).returning(Comment.user_id).execution_options(
+                synchronize_session=False
+            )
+        )).all())
+        for user_id, comments_count in deleted_by.items():
+            await db_session.execute(shift_user_stats_stmt(
+                user_id, comments_count=-comments_count))
+        if comment.comment_id:
+            await db_session.execute(
+                update(Comment).where(Comment.id == comment.comment_id).values(
+                    replies_count=Comment.replies_count - 1
+                )
+            )
+        else:
+            await db_session.execute(
+                update(Post).where(Post.id == comment.post_id).values(
+                    comments_count=Post.comments_count - 1
+                )
+            )
+        await db_session.commit()
         api_response = {
             'success': True,
             'data': {}
         }
-    finally:
-        db_session.close()
+    except Exception as ex:
+        print(ex.args[0])
+        await db_session.rollback()
     return api_response
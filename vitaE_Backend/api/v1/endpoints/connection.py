@@ -1,22 +1,92 @@
 #!/usr/bin/python3
 """Moule for endpoints management for user connections"""
-import re
 import uuid
-from sqlalchemy import and_
+from sqlalchemy import and_, select, delete
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from ..utils.navigation import paginate_list
+from ..utils.navigation import parse_span, keyset_select, keyset_page
 from ..utils.token_management import AuthTokenMngr
 from ..form_types import ConnectionModel
-from ..database import get_session, User, UserFollowing
+from ..database import get_db_session, UserFollowing
+from ..utils.follow_graph import follow_graph
+from ..utils.user_summaries import user_summaries
+from ..utils.invalidation import publish
+from ..utils.suggestions import queue_follow_change_stmt
+from ..utils.counters import shift_user_stats_stmt
+from ..workers.fanout import timeline_fanout
 
 
 endpoint = APIRouter(prefix='/api/v1')
 
 
+async def is_user_following(db_session: AsyncSession, follower_id, user_id):
+    """Checking if a user follows another user"""
+    if not follower_id:
+        return False
+    currntuserctn = await db_session.scalar(
+        select(UserFollowing.id).where(and_(
+            UserFollowing.follower_id == follower_id,
+            UserFollowing.following_id == user_id
+        ))
+    )
+    return currntuserctn is not None
+
+
+def connections_query(edge_column, user_column, user_id, viewer_id, span,
+                      after='', before=''):
+    """Create keyset query of connection edges joined to viewer edges"""
+    viewer_edge = aliased(UserFollowing)
+    back_edge = aliased(UserFollowing)
+    edges_query = select(
+        UserFollowing.id.label('edge_id'),
+        UserFollowing.created_on,
+        user_column.label('id'),
+        viewer_edge.id.label('viewer_edge_id'),
+        back_edge.id.label('back_edge_id')
+    ).outerjoin(viewer_edge, and_(
+        viewer_edge.follower_id == viewer_id,
+        viewer_edge.following_id == user_column
+    )).outerjoin(back_edge, and_(
+        back_edge.follower_id == user_column,
+        back_edge.following_id == viewer_id
+    )).where(edge_column == user_id)
+    return keyset_select(
+        edges_query, UserFollowing.created_on, UserFollowing.id, span,
+        after, before
+    )
+
+
+async def get_connections_rows(db_session: AsyncSession, edge_column,
+                               user_column, user_id, viewer_id, span, after,
+                               before):
+    """Get a page of connection edges joined to the viewer edges"""
+    edges_query = connections_query(
+        edge_column, user_column, user_id, viewer_id, span, after, before)
+    return keyset_page(
+        (await db_session.execute(edges_query)).all(), span, after,
+        before, lambda x: (x.created_on, x.edge_id)
+    )
+
+
+def connection_state(user):
+    """Create follow flags between the viewer and a connected user"""
+    is_following = user.viewer_edge_id is not None
+    is_followed_by = user.back_edge_id is not None
+    follow_state = {
+        'isFollowing': is_following,
+        'isFollowedBy': is_followed_by,
+        'isMutual': is_following and is_followed_by
+    }
+    return follow_state
+
+
 @endpoint.get('/followers')
-async def get_user_followers(id='', token='', span='12', after='', before=''):
+async def get_user_followers(
+        id='', token='', span='12', after='', before='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return followers of a certain user"""
     api_response = {
         'success': False,
@@ -24,59 +94,49 @@ async def get_user_followers(id='', token='', span='12', after='', before=''):
     }
     if not id:
         return api_response
-    auth_token = AuthTokenMngr.convert_token(token)
-    currntuser_id = auth_token.user_id if auth_token else None
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_sesion.close()
-            return api_response
-        span = int(span if span else '12')
-        userflwrs = db_session.query(UserFollowing). filter(
-            UserFollowing.following_id == id
-        ).all()
-        userflwrs_data = []
-        if userflwrs:
-            for userflwr in userflwrs:
-                user = db_session.query(User).filter(
-                    User.id == userflwr.follower_id
-                ).first()
-                if not user:
-                    continue
-                currntuserctn = db_session.query(UserFollowing).filter(and_(
-                    UserFollowing.follower_id == currntuser_id,
-                    UserFollowing.following_id == user.id
-                )).first()
-                follower_info = {
-                    'id': user.id,
-                    'name': user.name,
-                    'profielPictureId': user.profile_picture_id,
-                    'isFollowing': currntuserctn is not None
-                }
-                userflwrs_data.append(follower_info)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
+    currntuser_id = auth_token.user_id if auth_token else ''
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                userflwrs_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
+        }
+        return api_response
+    try:
+        userflwrs, next_cursor, prev_cursor = await get_connections_rows(
+            db_session, UserFollowing.following_id,
+            UserFollowing.follower_id, id, currntuser_id, span, after, before
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    users = await user_summaries.get_many(
+        db_session, [user.id for user in userflwrs])
+    userflwrs_data = []
+    for user in userflwrs:
+        if user.id not in users:
+            continue
+        follower_info = {
+            'id': user.id,
+            'name': users[user.id].name,
+            'profielPictureId': users[user.id].profile_picture_id,
+            **connection_state(user)
         }
-    finally:
-        db_session.close()
+        userflwrs_data.append(follower_info)
+    api_response = {
+        'success': True,
+        'data': userflwrs_data,
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
 
 
 @endpoint.get('/followings')
-async def get_user_followings(id='', token='', span='12', after='', before=''):
+async def get_user_followings(
+        id='', token='', span='12', after='', before='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return users followed by a certain user"""
     api_response = {
         'success': False,
@@ -84,65 +144,56 @@ async def get_user_followings(id='', token='', span='12', after='', before=''):
     }
     if not id:
         return api_response
-    auth_token = AuthTokenMngr.convert_token(token)
-    currntuser_id = auth_token.user_id if auth_token else None
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        userflwgs = db_session.query(UserFollowing).filter(
-            UserFollowing.follower_id == id
-        ).all()
-        userflwgs_data = []
-        if userflwgs:
-            for userflwg in userflwgs:
-                user = db_session.query(User).filter(
-                    User.id == userflwg.following_id
-                ).first()
-                if not user:
-                    continue
-                currntuserctn = db_session.query(UserFollowing).filter(and_(
-                    UserFollowing.follower_id == currntuser_id,
-                    UserFollowing.following_id == user.id
-                )).first()
-                following_info = {
-                    'id': user.id,
-                    'name': user.name,
-                    'profilePictureId': user.profile_picture_id,
-                    'isFollowing': currntuserctn is not None
-                }
-                userflwgs_data.append(following_info)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
+    currntuser_id = auth_token.user_id if auth_token else ''
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                userflwgs_data,
-                span,
-                after,
-                before,
-                False,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
         }
-    finally:
-        db_session.close()
+        return api_response
+    try:
+        userflwgs, next_cursor, prev_cursor = await get_connections_rows(
+            db_session, UserFollowing.follower_id,
+            UserFollowing.following_id, id, currntuser_id, span, after,
+            before
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    users = await user_summaries.get_many(
+        db_session, [user.id for user in userflwgs])
+    userflwgs_data = []
+    for user in userflwgs:
+        if user.id not in users:
+            continue
+        following_info = {
+            'id': user.id,
+            'name': users[user.id].name,
+            'profilePictureId': users[user.id].profile_picture_id,
+            **connection_state(user)
+        }
+        userflwgs_data.append(following_info)
+    api_response = {
+        'success': True,
+        'data': userflwgs_data,
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
 
 
 @endpoint.put('/follow')
-async def toggle_user_follow(body: ConnectionModel):
+async def toggle_user_follow(
+        body: ConnectionModel,
+        db_session: AsyncSession = Depends(get_db_session)):
     """Switch the follow status between two users"""
     api_response = {
         'success': False,
         'message': 'User following failed.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     invalid_condts = [
         auth_token is None,
         auth_token is not None and (auth_token.user_id != body.userId),
@@ -150,20 +201,29 @@ async def toggle_user_follow(body: ConnectionModel):
     ]
     if any(invalid_condts):
         return api_response
-    db_session = get_session()
     try:
-        currntuserctn = db_session.query(UserFollowing).filter(and_(
-            UserFollowing.follower_id == auth_token.user_id,
-            UserFollowing.following_id == body.followId
-        )).first()
+        currntuserctn = await is_user_following(
+            db_session, auth_token.user_id, body.followId)
         if currntuserctn:
-            db_session.query(UserFollowing).filter(and_(
+            await db_session.execute(delete(UserFollowing).where(and_(
                 UserFollowing.follower_id == auth_token.user_id,
                 UserFollowing.following_id == body.followId
-            )).delete(
-                synchronize_session=False
+            )))
+            await db_session.execute(shift_user_stats_stmt(
+                auth_token.user_id, followings_count=-1))
+            await db_session.execute(shift_user_stats_stmt(
+                body.followId, followers_count=-1))
+            await db_session.execute(
+                queue_follow_change_stmt(auth_token.user_id))
+            await publish(
+                db_session, 'follow', f'{auth_token.user_id} {body.followId}')
+            await db_session.commit()
+            follow_graph.invalidate(auth_token.user_id, body.followId)
+            timeline_fanout.enqueue(
+                'unfollow',
+                viewer_id=auth_token.user_id,
+                author_id=body.followId
             )
-            db_session.commit()
             api_response = {
                 'success': True,
                 'data': {'status': False}
@@ -176,14 +236,25 @@ async def toggle_user_follow(body: ConnectionModel):
                 following_id=body.followId
             )
             db_session.add(new_connection)
-            db_session.commit()
+            await db_session.execute(shift_user_stats_stmt(
+                body.userId, followings_count=1))
+            await db_session.execute(shift_user_stats_stmt(
+                body.followId, followers_count=1))
+            await db_session.execute(queue_follow_change_stmt(body.userId))
+            await publish(
+                db_session, 'follow', f'{body.userId} {body.followId}')
+            await db_session.commit()
+            follow_graph.invalidate(body.userId, body.followId)
+            timeline_fanout.enqueue(
+                'follow',
+                viewer_id=body.userId,
+                author_id=body.followId
+            )
             api_response = {
                 'success': True,
                 'data': {'status': True}
             }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
@@ -1,88 +1,104 @@
 #!/usr/bin/python3
 """Module for handling post-related API endpoints"""
-import re
+import os
 import uuid
 import json
-from sqlalchemy import and_
+from sqlalchemy import and_, select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
 from ..utils.token_management import AuthTokenMngr
 from ..database import (
-    get_session, User, Comment, Post, PostLike, UserFollowing)
+    get_db_session, Comment, Post, PostLike, PostScore, Timeline)
 from ..form_types import (
-    PostAddModel, PostUpdateModel, PostLikeModel, PostDeleteModel)
-from ..utils.navigation import paginate_list
+    PostAddModel,
+    PostUpdateModel,
+    PostLikeModel,
+    PostLikeStatusModel,
+    PostDeleteModel
+)
+from ..utils.navigation import (
+    parse_span, encode_cursor, decode_cursor, keyset_select, keyset_page)
+from ..utils.hybrid_feed import pull_authors, recent_posts, merge_feed_keys
+from ..utils.post_cards import hydrate_posts
+from ..utils.trending import unfollowed_condition
+from ..utils.explore_seen import SeenPosts
+from ..utils.metrics import incr_counter
+from ..utils.invalidation import publish
+from ..utils.counters import shift_user_stats_stmt, recount_user_stats_stmt
+from ..workers.fanout import timeline_fanout
 
 
 endpoint = APIRouter(prefix='/api/v1')
 
+MAX_LIKE_STATUS_IDS = 500
+"""Largest number of posts checked in a single like-status request"""
+
+
+async def get_explore_rows(db_session: AsyncSession, user_id, span, after,
+                           before, seen_posts=None):
+    """Get a page of ranked explore candidates skipping seen posts"""
+    max_rounds = int(os.getenv('EXPLORE_SEEN_ROUNDS', '4'))
+    batch_size = span if seen_posts is None else span * 4
+    candidates = []
+    scan_cursor = after
+    scan_more = False
+    for _ in range(max_rounds if seen_posts is not None else 1):
+        scores_query = keyset_select(
+            select(PostScore.post_id, PostScore.score).where(
+                unfollowed_condition(user_id)
+            ),
+            PostScore.score, PostScore.post_id, batch_size, scan_cursor,
+            before, value_type=float
+        )
+        scores_rows = (await db_session.execute(scores_query)).all()
+        for row in scores_rows:
+            if seen_posts is not None and row.post_id in seen_posts:
+                incr_counter('explore.seen_skipped')
+            else:
+                candidates.append(row)
+        scan_more = len(scores_rows) > batch_size
+        if len(candidates) > span or not scan_more:
+            break
+        scan_cursor = encode_cursor(
+            scores_rows[-1].score, scores_rows[-1].post_id)
+    posts_rows, next_cursor, prev_cursor = keyset_page(
+        candidates, span, after, before, lambda x: (x.score, x.post_id))
+    if len(candidates) <= span and scan_more and not before:
+        next_cursor = scan_cursor
+    return posts_rows, next_cursor, prev_cursor
+
 
 @endpoint.get('/post')
-async def get_post(id: str, token: str):
+async def get_post(id: str, token: str,
+                   db_session: AsyncSession = Depends(get_db_session)):
     """Create and return infomation about a certain post"""
     api_response = {
         'success': False,
         'message': 'Post not found.'
     }
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     user_id = auth_token.user_id if auth_token is not None else None
-    db_session = get_session()
-    try:
-        post = db_session.query(Post).filter(Post.id == id).first()
-        if post:
-            user = db_session.query(User).filter(
-                User.id == post.user_id
-            ).first()
-            if not user:
-                return api_response
-            comments = db_session.query(Comment).filter(and_(
-                Comment.post_id == id,
-                Comment.comment_id == None
-            )).all()
-            comment_count = len(comments) if comments else 0
-            likes = db_session.query(PostLike).filter(
-                PostLike.post_id == id
-            ).all()
-            like_count = len(likes) if likes else 0
-            is_liked_by_user = False
-            if user_id:
-                post_dits = db_session.query(PostLike).filter(and_(
-                    PostLike.post_id == id,
-                    PostLike.user_id == user_id
-                )).first()
-                if post_dits:
-                    is_liked_by_user = True
-            api_response = {
-                'success': True,
-                'data': {
-                    'id': post.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'title': post.title,
-                    'publishedOn': post.created_on.isoformat(),
-                    'stories': post.content,
-                    'commentsCount': comment_count,
-                    'likesCount': like_count,
-                    'isLiked': is_liked_by_user
-                }
-            }
-    finally:
-        db_session.close()
+    posts_data = await hydrate_posts(db_session, [id], user_id)
+    if posts_data:
+        api_response = {
+            'success': True,
+            'data': posts_data[0]
+        }
     return api_response
 
 
 @endpoint.post('/post')
-async def create_post(body: PostAddModel):
+async def create_post(body: PostAddModel,
+                      db_session: AsyncSession = Depends(get_db_session)):
     """Get a new post entry"""
     api_response = {
         'success': False,
         'message': 'Failed creation of post.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
@@ -95,7 +111,6 @@ async def create_post(body: PostAddModel):
     if not all(list(map(lambda x: len(x.strip()) > 1, body.stories))):
         api_response['message'] = 'Stories are too short.'
         return api_response
-    db_session = get_session()
     try:
         gen_id = str(uuid.uuid4())
         currntdt = datetime.utcnow()
@@ -109,7 +124,23 @@ async def create_post(body: PostAddModel):
             content=stories_txt
         )
         db_session.add(post)
-        db_session.commit()
+        db_session.add(Timeline(
+            viewer_id=body.userId,
+            post_id=gen_id,
+            author_id=body.userId,
+            created_on=currntdt
+        ))
+        await db_session.execute(
+            shift_user_stats_stmt(body.userId, posts_count=1))
+        if body.userId in pull_authors:
+            await publish(db_session, 'author_posts', body.userId)
+        await db_session.commit()
+        timeline_fanout.enqueue(
+            'post',
+            author_id=body.userId,
+            post_id=gen_id,
+            created_on=currntdt
+        )
         api_response = {
             'success': True,
             'data': {
@@ -121,20 +152,19 @@ async def create_post(body: PostAddModel):
         }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.put('/post')
-async def modify_post(body: PostUpdateModel):
+async def modify_post(body: PostUpdateModel,
+                      db_session: AsyncSession = Depends(get_db_session)):
     """Modify the content and an existing post"""
     api_response = {
         'success': False,
         'message': 'Failed to update post.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
@@ -147,127 +177,173 @@ async def modify_post(body: PostUpdateModel):
     if not all(list(map(lambda x: len(x.strip()) > 1, body.stories))):
         api_response['message'] = 'Stories are too short.'
         return api_response
-    db_session = get_session()
     try:
         currntdt = datetime.utcnow()
         stories_txt = json.JSONEncoder().encode(body.stories)
-        db_session.query(Post).filter(Post.id == body.postId).update(
-            {
-                Post.title: body.title,
-                Post.updated_on: currntdt,
-                Post.content: stories_txt
-            },
-            synchronize_session=False
+        await db_session.execute(
+            update(Post).where(Post.id == body.postId).values(
+                title=body.title,
+                updated_on=currntdt,
+                content=stories_txt
+            )
         )
-        db_session.commit()
+        await db_session.commit()
         api_response = {
             'success': True,
             'data': {}
         }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.delete('/post')
-async def delete_post(body: PostDeleteModel):
+async def delete_post(body: PostDeleteModel,
+                      db_session: AsyncSession = Depends(get_db_session)):
     """Remove a post permanently"""
     api_response = {
         'success': False,
         'message': 'Failed to delete post.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
-    db_session = get_session()
-    try:
-        post = db_session.query(Post).filter(and_(
-            Post.id == body.postId,
-            Post.user_id == body.userId
-        )).first()
-        if post:
-            db_session.query(PostLike).filter(
+    post = await db_session.scalar(select(Post).where(and_(
+        Post.id == body.postId,
+        Post.user_id == body.userId
+    )))
+    if post:
+        likers_ids = (await db_session.scalars(
+            delete(PostLike).where(
                 PostLike.post_id == body.postId
-            ).delete(
-                synchronize_session=False
-            )
-            db_session.query(Comment).filter(
+            ).returning(PostLike.user_id)
+        )).all()
+        commenters_ids = (await db_session.scalars(
+            delete(Comment).where(
                 Comment.post_id == body.postId
-            ).delete(
-                synchronize_session=False
-            )
-            db_session.query(Post).filter(and_(
-                Post.id == body.postId,
-                Post.user_id == body.userId
-            )).delete(
-                synchronize_session=False
-            )
-            db_session.commit()
-            api_response = {
-                'success': True,
-                'data': {}
-            }
-    finally:
-        db_session.close()
+            ).returning(Comment.user_id)
+        )).all()
+        await db_session.execute(
+            delete(PostScore).where(PostScore.post_id == body.postId))
+        await db_session.execute(delete(Post).where(and_(
+            Post.id == body.postId,
+            Post.user_id == body.userId
+        )))
+        affected_ids = {body.userId, *likers_ids, *commenters_ids}
+        await db_session.execute(recount_user_stats_stmt(list(affected_ids)))
+        await publish(db_session, 'author_posts', body.userId)
+        await db_session.commit()
+        timeline_fanout.enqueue(
+            'delete_post',
+            author_id=body.userId,
+            post_id=body.postId
+        )
+        api_response = {
+            'success': True,
+            'data': {}
+        }
     return api_response
 
 
 @endpoint.put('/like-post')
-async def like_post(body: PostLikeModel):
+async def like_post(body: PostLikeModel,
+                    db_session: AsyncSession = Depends(get_db_session)):
     """Switch like status on a post"""
     api_response = {
         'success': False,
         'message': 'Failed to like post.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
-    db_session = get_session()
     try:
-        prevlike = db_session.query(PostLike).filter(and_(
+        unliked = await db_session.execute(delete(PostLike).where(and_(
             PostLike.user_id == auth_token.user_id,
             PostLike.post_id == body.postId
-        )).first()
-        if prevlike:
-            db_session.query(PostLike).filter(and_(
-                PostLike.user_id == auth_token.user_id,
-                PostLike.post_id == body.postId
-            )).delete(
-                synchronize_session=False
-            )
-            db_session.commit()
-            api_response = {
-                'success': True,
-                'data': {'status': False}
-            }
+        )))
+        like_status = False
+        if unliked.rowcount:
+            likes_shift = -unliked.rowcount
         else:
-            new_like = PostLike(
-                id=str(uuid.uuid4()),
-                created_on=datetime.utcnow(),
-                user_id=body.userId,
-                post_id=body.postId
+            liked = await db_session.execute(
+                insert(PostLike).values(
+                    id=str(uuid.uuid4()),
+                    created_on=datetime.utcnow(),
+                    user_id=body.userId,
+                    post_id=body.postId
+                ).on_conflict_do_nothing().returning(PostLike.id)
             )
-            db_session.add(new_like)
-            db_session.commit()
-            api_response = {
-                'success': True,
-                'data': {'status': True}
-            }
+            like_status = True
+            likes_shift = 1 if liked.first() else 0
+        if likes_shift:
+            await db_session.execute(
+                update(Post).where(Post.id == body.postId).values(
+                    likes_count=Post.likes_count + likes_shift
+                )
+            )
+            await db_session.execute(shift_user_stats_stmt(
+                auth_token.user_id, likes_count=likes_shift))
+        await db_session.commit()
+        api_response = {
+            'success': True,
+            'data': {'status': like_status}
+        }
     except Exception as ex:
         print(ex.args[0])
-        db_session.rollback()
-    finally:
-        db_session.close()
+        await db_session.rollback()
+    return api_response
+
+
+@endpoint.post('/posts/like-status')
+async def get_posts_like_status(
+        body: PostLikeStatusModel,
+        db_session: AsyncSession = Depends(get_db_session)):
+    """Create and return like status and counts of many posts"""
+    api_response = {
+        'success': False,
+        'message': 'Failed to find like status of posts.'
+    }
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
+    if auth_token is None:
+        api_response['message'] = 'Invalid authentication token.'
+        return api_response
+    posts_ids = list(dict.fromkeys(body.postIds))
+    if len(posts_ids) > MAX_LIKE_STATUS_IDS:
+        api_response['message'] = 'Too many posts requested.'
+        return api_response
+    likes_rows = []
+    if posts_ids:
+        likes_rows = (await db_session.execute(
+            select(
+                Post.id,
+                Post.likes_count,
+                PostLike.id.label('like_id')
+            ).outerjoin(PostLike, and_(
+                PostLike.post_id == Post.id,
+                PostLike.user_id == auth_token.user_id
+            )).where(Post.id.in_(posts_ids))
+        )).all()
+    likes_status = {row.id: row for row in likes_rows}
+    api_response = {
+        'success': True,
+        'data': [
+            {
+                'id': post_id,
+                'isLiked': likes_status[post_id].like_id is not None,
+                'likesCount': likes_status[post_id].likes_count
+            }
+            for post_id in posts_ids if post_id in likes_status
+        ]
+    }
     return api_response
 
 
 @endpoint.get('/posts-user-made')
-async def get_users_posts(userId, token='', span='', after='', before=''):
+async def get_users_posts(userId, token='', span='', after='', before='',
+                          db_session: AsyncSession = Depends(get_db_session)):
     """Create and return posts made by the present user"""
     api_response = {
         'success': False,
@@ -275,84 +351,38 @@ async def get_users_posts(userId, token='', span='', after='', before=''):
     }
     if not userId:
         return api_response
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     currntuser_id = auth_token.user_id if auth_token is not None else None
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        posts_made = db_session.query(Post).filter(
-            Post.user_id == userId
-        ).all()
-        post_data = []
-        if posts_made:
-            user = db_session.query(User).filter(
-                User.id == userId
-            ).first()
-            if not user:
-                return api_response
-            for post in posts_made:
-                comments = db_session.query(Comment).filter(and_(
-                    Comment.post_id == post.id,
-                    Comment.comment_id == None
-                )).all()
-                comment_count = len(comments) if comments else 0
-                likes = db_session.query(PostLike).filter(
-                    PostLike.post_id == post.id
-                ).all()
-                like_count = len(likes) if likes else 0
-                is_liked_by_user = False
-                if currntuser_id:
-                    post_dits = db_session.query(PostLike).filter(and_(
-                        PostLike.post_id == post.id,
-                        PostLike.user_id == currntuser_id
-                    )).first()
-                    if post_dits:
-                        is_liked_by_user = True
-                post_info = {
-                    'id': post.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'title': post.title,
-                    'publishedOn': post.created_on.isoformat(),
-                    'stories': post.content,
-                    'commentsCount': comment_count,
-                    'likesCount': like_count,
-                    'isLiked': is_liked_by_user
-                }
-                post_data.append(post_info)
-        post_data.sort(
-            key=lambda x: datetime.fromisoformat(x['publishedOn']),
-            reverse=True
-        )
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                post_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
         }
-    finally:
-        db_session.close()
+        return api_response
+    try:
+        posts_query = keyset_select(
+            select(Post.id, Post.created_on).where(Post.user_id == userId),
+            Post.created_on, Post.id, span, after, before
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    posts_rows, next_cursor, prev_cursor = keyset_page(
+        (await db_session.execute(posts_query)).all(), span, after, before)
+    posts_ids = [post.id for post in posts_rows]
+    api_response = {
+        'success': True,
+        'data': await hydrate_posts(db_session, posts_ids, currntuser_id),
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
 
 
 @endpoint.get('/posts-user-likes')
-async def get_liked_posts(userId, token='', span='', after='', before=''):
+async def get_liked_posts(userId, token='', span='', after='', before='',
+                          db_session: AsyncSession = Depends(get_db_session)):
     """Create and return liked post by a user"""
     api_response = {
         'success': False,
@@ -360,264 +390,137 @@ async def get_liked_posts(userId, token='', span='', after='', before=''):
     }
     if not userId:
         return api_response
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     user_id = auth_token.user_id if auth_token is not None else None
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        likes = db_session.query(PostLike).filter(
-            PostLike.user_id == userId
-        ).all()
-        liked_posts = []
-        for post_like in likes:
-            post = db_session.query(Post).filter(
-                Post.id == post_like.post_id
-            ).first()
-            user = db_session.query(User).filter(
-                User.id == post.user_id
-            ).first()
-            comments = db_session.query(Comment).filter(and_(
-                Comment.post_id == post.id,
-                Comment.comment_id == None
-            )).all()
-            comment_count = len(comments) if comments else 0
-            likes = db_session.query(PostLike).filter(
-                PostLike.post_id == post.id
-            ).all()
-            like_count = len(likes) if likes else 0
-            is_liked_by_user = False
-            if user_id != userId:
-                post_dits = db_session.query(PostLike).filter(and_(
-                    PostLike.post_id == post.id,
-                    PostLike.user_id == user_id
-                )).first()
-                if post_dits:
-                    is_liked_by_user = True
-            else:
-                is_liked_by_user = True
-            likes_info = {
-                'id': post.id,
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'profilePictureId': user.profile_picture_id
-                },
-                'title': post.title,
-                'publishedOn': post.created_on.isoformat(),
-                'stories': post.content,
-                'commentsCount': comment_count,
-                'likesCount': like_count,
-                'isLiked': is_liked_by_user
-            }
-            liked_posts.append(likes_info)
-        liked_posts.sort(
-            key=lambda x: datetime.fromisoformat(x['publishedOn'])
-        )
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                liked_posts,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
         }
-    finally:
-        db_session.close()
+        return api_response
+    try:
+        likes_query = keyset_select(
+            select(PostLike.id, PostLike.created_on, PostLike.post_id).where(
+                PostLike.user_id == userId
+            ),
+            PostLike.created_on, PostLike.id, span, after, before
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    likes_rows, next_cursor, prev_cursor = keyset_page(
+        (await db_session.execute(likes_query)).all(), span, after, before)
+    liked_ids = [post_like.post_id for post_like in likes_rows]
+    api_response = {
+        'success': True,
+        'data': await hydrate_posts(db_session, liked_ids, user_id),
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
 
 
 @endpoint.get('/posts-feed')
-async def get_feed_posts(token, span='', after='', before=''):
+async def get_feed_posts(token, span='', after='', before='',
+                         db_session: AsyncSession = Depends(get_db_session)):
     """Create and return user's feed post"""
     api_response = {
         'success': False,
         'message': 'Failed to find post for the feed.'
     }
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     if auth_token is None:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
     user_id = auth_token.user_id
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        userflwgs = db_session.query(UserFollowing).filter(
-            UserFollowing.follower_id == user_id
-        ).all()
-        max_size = 2**32 - 1
-        flwngs_count = len(userflwgs) + 1 if userflwgs else 1
-        posts_per_flwngs = max_size // flwngs_count
-        posts_users_ids = [user_id]
-        if userflwgs:
-            posts_users_ids.extend(list(
-                map(lambda x: x.following_id, userflwgs)))
-        posts_data = []
-        for id in posts_users_ids:
-            posts = db_session.query(Post).filter(
-                Post.user_id == id
-            ).limit(posts_per_flwngs).all()
-            user = db_session.query(User).filter(
-                User.id == id
-            ).first()
-            for post in posts:
-                comments = db_session.query(Comment).filter(and_(
-                    Comment.post_id == post.id,
-                    Comment.comment_id == None
-                )).all()
-                comment_count = len(comments) if comments else 0
-                likes = db_session.query(PostLike).filter(
-                    PostLike.post_id == post.id
-                ).all()
-                like_count = len(likes) if likes else 0
-                is_liked_by_user = False
-                if user_id:
-                    post_dits = db_session.query(PostLike).filter(and_(
-                        PostLike.post_id == post.id,
-                        PostLike.user_id == user_id
-                    )).first()
-                    if post_dits:
-                        is_liked_by_user = True
-                post_info = {
-                    'id': post.id,
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'profilePictureId': user.profile_picture_id
-                    },
-                    'title': post.title,
-                    'publishedOn': post.created_on.isoformat(),
-                    'stories': post.content,
-                    'commentsCount': comment_count,
-                    'likesCount': like_count,
-                    'isLiked': is_liked_by_user
-                }
-                posts_data.append(post_info)
-        posts_data.sort(
-            key=lambda x: datetime.fromisoformat(x['publishedOn']),
-            reverse=True
-        )
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                posts_data,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
         }
-    finally:
-        db_session.close()
+        return api_response
+    try:
+        timeline_query = keyset_select(
+            select(Timeline.created_on, Timeline.post_id).where(
+                Timeline.viewer_id == user_id
+            ),
+            Timeline.created_on, Timeline.post_id, span, after, before
+        )
+        cursor_key = None
+        if after or before:
+            cursor_key = decode_cursor(after or before)
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    timeline_keys = [
+        tuple(row) for row in (await db_session.execute(timeline_query)).all()
+    ]
+    incr_counter('feed.timeline_reads')
+    pulled_ids = await pull_authors.followed_by(db_session, user_id)
+    if pulled_ids:
+        authors_posts = await recent_posts.get_many(db_session, pulled_ids)
+        timeline_keys = merge_feed_keys(
+            timeline_keys, authors_posts.values(), span, before, cursor_key)
+        incr_counter('feed.pull_reads')
+        incr_counter('feed.pull_authors_merged', len(pulled_ids))
+    feed_keys, next_cursor, prev_cursor = keyset_page(
+        timeline_keys, span, after, before, lambda x: x)
+    posts_ids = [post_id for _, post_id in feed_keys]
+    api_response = {
+        'success': True,
+        'data': await hydrate_posts(db_session, posts_ids, user_id),
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
 
 
 @endpoint.get('/posts-explore')
-async def get_exploratory_posts(token, span='', after='', before=''):
+async def get_exploratory_posts(
+        token, span='', after='', before='',
+        db_session: AsyncSession = Depends(get_db_session)):
     """Create and return posts for the explore section"""
     api_response = {
         'success': False,
         'message': 'Failed to find posts for the explore section.'
     }
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     if auth_token is None:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
     user_id = auth_token.user_id if auth_token is not None else None
-    db_session = get_session()
-    try:
-        span = span.strip()
-        if span and re.fullmatch(r'\d+', span) is None:
-            api_response = {
-                'success': False,
-                'message': 'Invalid span type.'
-            }
-            db_session.close()
-            return api_response
-        span = int(span if span else '12')
-        userflwgs = db_session.query(UserFollowing).filter(
-            UserFollowing.follower_id == user_id
-        ).all()
-        max_posts_count = 48
-        post_users_ids = [user_id]
-        if userflwgs:
-            post_users_ids.extend(
-                list(map(lambda x: x.following_id, userflwgs))
-            )
-        explore_posts = []
-        posts = db_session.query(Post).filter(
-            Post.user_id.notin_(post_users_ids)
-        ).limit(max_posts_count).all()
-        for post in posts:
-            user = db_session.query(User).filter(
-                User.id == post.user_id
-            ).first()
-            comments = db_session.query(Comment).filter(and_(
-                Comment.post_id == post.id,
-                Comment.comment_id == None
-            )).all()
-            comment_count = len(comments) if comments else 0
-            likes = db_session.query(PostLike).filter(
-                PostLike.post_id == post.id
-            ).all()
-            like_count = len(likes) if likes else 0
-            is_liked_by_user = False
-            if user_id:
-                post_dits = db_session.query(PostLike).filter(and_(
-                    PostLike.post_id == post.id,
-                    PostLike.user_id == user_id
-                )).first()
-                if post_dits:
-                    is_liked_by_user = True
-            post_info = {
-                'id': post.id,
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'profilePictureId': user.profile_picture_id
-                },
-                'title': post.title,
-                'publishedOn': post.created_on.isoformat(),
-                'stories': post.content,
-                'commentsCount': comment_count,
-                'likesCount': like_count,
-                'isLiked': is_liked_by_user
-            }
-            explore_posts.append(post_info)
-        explore_posts.sort(
-            key=lambda x: x['likesCount'],
-            reverse=True
-        )
+    span = parse_span(span)
+    if span is None:
         api_response = {
-            'success': True,
-            'data': paginate_list(
-                explore_posts,
-                span,
-                after,
-                before,
-                True,
-                lambda x: x['id']
-            )
+            'success': False,
+            'message': 'Invalid span type.'
         }
-    finally:
-        db_session.close()
+        return api_response
+    seen_posts = None
+    if not before:
+        seen_posts = await SeenPosts.load(db_session, user_id)
+    try:
+        posts_rows, next_cursor, prev_cursor = await get_explore_rows(
+            db_session, user_id, span, after, before, seen_posts)
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    incr_counter('explore.reads')
+    posts_ids = [post.post_id for post in posts_rows]
+    if seen_posts is not None and posts_ids:
+        try:
+            seen_posts.add_many(posts_ids)
+            await seen_posts.save(db_session)
+            await db_session.commit()
+        except Exception as ex:
+            print(ex.args[0])
+            await db_session.rollback()
+    api_response = {
+        'success': True,
+        'data': await hydrate_posts(db_session, posts_ids, user_id),
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
     return api_response
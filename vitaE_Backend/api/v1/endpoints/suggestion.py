@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Module for endpoints management for people suggestions"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends
+
+from ..utils.navigation import parse_span, keyset_select, keyset_page
+from ..utils.token_management import AuthTokenMngr
+from ..utils.follow_graph import follow_graph
+from ..utils.user_summaries import user_summaries
+from ..database import get_db_session, UserSuggestion
+
+
+endpoint = APIRouter(prefix='/api/v1')
+
+
+@endpoint.get('/suggestions')
+async def get_suggestions(token='', span='12', after='', before='',
+                          db_session: AsyncSession = Depends(get_db_session)):
+    """Create and return accounts the user may want to follow"""
+    api_response = {
+        'success': False,
+        'message': 'Failed to find suggestions.'
+    }
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
+    if auth_token is None:
+        api_response['message'] = 'Invalid authentication token.'
+        return api_response
+    span = parse_span(span)
+    if span is None:
+        api_response = {
+            'success': False,
+            'message': 'Invalid span type.'
+        }
+        return api_response
+    try:
+        suggestions_query = keyset_select(
+            select(
+                UserSuggestion.suggested_id,
+                UserSuggestion.mutual_count
+            ).where(UserSuggestion.user_id == auth_token.user_id),
+            UserSuggestion.mutual_count, UserSuggestion.suggested_id, span,
+            after, before, value_type=int
+        )
+    except ValueError as ex:
+        api_response['message'] = str(ex)
+        return api_response
+    suggestions_rows, next_cursor, prev_cursor = keyset_page(
+        (await db_session.execute(suggestions_query)).all(), span, after,
+        before, lambda x: (x.mutual_count, x.suggested_id)
+    )
+    suggested_ids = [user.suggested_id for user in suggestions_rows]
+    following_flags = await follow_graph.following_flags(
+        db_session, auth_token.user_id, suggested_ids)
+    users = await user_summaries.get_many(db_session, suggested_ids)
+    api_response = {
+        'success': True,
+        'data': [
+            {
+                **users[user.suggested_id].to_dict(),
+                'mutualCount': user.mutual_count
+            }
+            for user in suggestions_rows
+            if user.suggested_id in users
+            and not following_flags[user.suggested_id]
+        ],
+        'next': next_cursor,
+        'prev': prev_cursor
+    }
+    return api_response
@@ -3,18 +3,34 @@
 import os
 import email_validator
 from datetime import datetime
-from fastapi import APIRouter
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends
+from sqlalchemy import and_, or_, case, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from imagekitio import ImageKit
 
 from ..form_types import UserUpdateModel, UserDeleteModel
-from ..utils.token_management import AuthTokenMngr
+from ..utils.token_management import AuthTokenMngr, auth_token_cache
+from ..utils.counters import (
+    recount_posts_stmt,
+    recount_comments_stmt,
+    recount_user_stats_stmt
+)
+from ..utils.comment_threads import subtree_cte
+from ..utils.follow_graph import follow_graph
+from ..utils.user_summaries import user_summaries
+from ..utils.invalidation import publish
+from ..workers.fanout import timeline_fanout
 from ..database import (
-    get_session,
+    get_db_session,
     User,
     UserFollowing,
+    ExploreSeen,
+    UserSuggestion,
+    SuggestionQueue,
+    UserStats,
     Post,
     PostLike,
+    PostScore,
     Comment
 )
 
@@ -22,75 +38,70 @@ from ..database import (
 endpoint = APIRouter(prefix='/api/v1')
 
 
+def profile_query(user_id: str):
+    """Create query of a user joined to the profile counters"""
+    return select(User, UserStats).outerjoin(
+        UserStats, UserStats.user_id == User.id
+    ).where(User.id == user_id)
+
+
 @endpoint.get('/user')
-async def get_user(id: str, token=''):
+async def get_user(id: str, token='',
+                   db_session: AsyncSession = Depends(get_db_session)):
     """Create and return info on a certain user"""
     api_response = {
         'success': False,
         'message': 'User not found.'
     }
-    auth_token = AuthTokenMngr.convert_token(token)
+    auth_token = await AuthTokenMngr.convert_token(token, db_session)
     if id is None:
         return api_response
     user_id = auth_token.user_id if auth_token is not None else ''
-    db_session = get_session()
-    try:
-        user = db_session.query(User).filter(User.id == id).first()
-        if user:
-            followers = db_session.query(UserFollowing).filter(
-                UserFollowing.following_id == user.id
-            ).all()
-            followings = db_session.query(UserFollowing).filter(
-                UserFollowing.follower_id == user.id
-            ).all()
-            posts = db_session.query(Post).filter(
-                Post.user_id == user.id
-            ).all()
-            likes = db_session.query(PostLike).filter(
-                PostLike.user_id == user.id
-            ).all()
-            comments = db_session.query(Comment).filter(
-                Comment.user_id == user.id
-            ).all()
-            currntuser_ctn = db_session.query(UserFollowing).filter(and_(
-                UserFollowing.follower_id == user.id,
-                UserFollowing.following_id == user.id
-            )).first()
-            flwrs_count = len(followers) if followers else 0
-            flwngs_count = len(followings) if followings else 0
-            posts_count = len(posts) if posts else 0
-            like_count = len(likes) if likes else 0
-            comment_count = len(comments) if comments else 0
-            api_response = {
-                'success': True,
-                'data': {
-                    'id': user.id,
-                    'joined': user.created_on.isoformat(),
-                    'name': user.name,
-                    'email': user.email if user.id == user_id else '',
-                    'bio': user.bio,
-                    'profilePictureId': user.profile_picture_id,
-                    'followersCount': flwrs_count,
-                    'followingsCount': flwngs_count,
-                    'postsCount': posts_count,
-                    'likesCount': like_count,
-                    'commentsCount': comment_count,
-                    'isFollowing': currntuser_ctn is not None
-                }
+    user_row = (await db_session.execute(profile_query(id))).first()
+    if user_row:
+        user, user_stats = user_row
+        if user_stats is None:
+            user_stats = UserStats(
+                followers_count=0,
+                followings_count=0,
+                posts_count=0,
+                likes_count=0,
+                comments_count=0
+            )
+        is_following = False
+        if user_id and user_id != user.id:
+            is_following = await follow_graph.is_following(
+                db_session, user_id, user.id)
+        api_response = {
+            'success': True,
+            'data': {
+                'id': user.id,
+                'joined': user.created_on.isoformat(),
+                'name': user.name,
+                'email': user.email if user.id == user_id else '',
+                'bio': user.bio,
+                'profilePictureId': user.profile_picture_id,
+                'followersCount': user_stats.followers_count,
+                'followingsCount': user_stats.followings_count,
+                'postsCount': user_stats.posts_count,
+                'likesCount': user_stats.likes_count,
+                'commentsCount': user_stats.comments_count,
+                'isFollowing': is_following
             }
-    finally:
-        db_session.close()
+        }
     return api_response
 
 
 @endpoint.put('/user')
-async def update_user_info(body: UserUpdateModel):
+async def update_user_info(
+        body: UserUpdateModel,
+        db_session: AsyncSession = Depends(get_db_session)):
     """Modify the user's profile info"""
     api_response = {
         'success': False,
         'message': 'Update user profile failed.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or (auth_token.user_id != body.userId):
         api_response['message'] = 'Invalid authentication token.'
         return api_response
@@ -99,7 +110,6 @@ async def update_user_info(body: UserUpdateModel):
         return api_response
     elif len(body.bio) > 384:
         api_response['message'] = 'Bio is too long.'
-    db_session = get_session()
     imagekit = ImageKit(
         private_key=os.getenv('IMG_PRIV_KEY'),
         public_key=os.getenv('IMG_PUB_KEY'),
@@ -115,9 +125,8 @@ async def update_user_info(body: UserUpdateModel):
         if body.profilePicture and not body.removeProfilePicture:
             if profile_pic_file_id:
                 imagekit.delete_file(profile_pic_file_id)
-            user = db_session.query(User).filter(
-                User.id == body.userId
-            ).first()
+            user = await db_session.scalar(
+                select(User).where(User.id == body.userId))
             if user.profile_picture_id:
                 imagekit.delete_file(user.profile_picture_id)
             upload_res = imagekit.upload_file(
@@ -133,21 +142,26 @@ async def update_user_info(body: UserUpdateModel):
                 print(profile_pic_file_id)
             if upload_res['error']:
                 raise ValueError(upload_res['error']['message'])
-        db_session.query(User).filter(User.id == body.userId).update(
-            {
-                User.updated_on: datetime.utcnow(),
-                User.name: body.name,
-                User.profile_picture_id: profile_pic_file_id,
-                User.email: body.email,
-                User.bio: body.bio
-            },
-            synchronize_session=False
+        token_version = await db_session.scalar(
+            update(User).where(User.id == body.userId).values(
+                updated_on=datetime.utcnow(),
+                name=body.name,
+                profile_picture_id=profile_pic_file_id,
+                email=body.email,
+                bio=body.bio,
+                token_version=User.token_version + case(
+                    (User.email != body.email, 1), else_=0)
+            ).returning(User.token_version)
         )
-        db_session.commit()
+        await publish(db_session, 'user', body.userId)
+        await publish(db_session, 'auth_user', body.userId)
+        await db_session.commit()
+        user_summaries.invalidate(body.userId)
+        auth_token_cache.invalidate_user(body.userId)
         new_auth_token = AuthTokenMngr(
             user_id=body.userId,
             email=body.email,
-            secure_text=auth_token.secure_text
+            token_version=token_version
         )
         api_response = {
             'success': True,
@@ -161,61 +175,106 @@ async def update_user_info(body: UserUpdateModel):
     except Exception as ex:
         print(ex.args[0])
     finally:
-        db_session.rollback()
-        db_session.close()
+        await db_session.rollback()
     return api_response
 
 
 @endpoint.delete('/user')
-async def remove_user(body: UserDeleteModel):
+async def remove_user(body: UserDeleteModel,
+                      db_session: AsyncSession = Depends(get_db_session)):
     """Deleting user data and account permanently"""
     api_response = {
         'success': False,
         'message': 'Failed to delete user data.'
     }
-    auth_token = AuthTokenMngr.convert_token(body.authToken)
+    auth_token = await AuthTokenMngr.convert_token(body.authToken, db_session)
     if auth_token is None or auth_token.user_id != body.userId:
         api_response['message'] = 'Invalid authentication token.'
         return api_response
-    db_session = get_session()
     try:
-        db_session.query(UserFollowing).filter(or_(
-            UserFollowing.follower_id == body.userId,
-            UserFollowing.following_id == body.userId
-        )).delete(
-            synchronize_session=False
-        )
-        db_session.query(PostLike).filter(
-            PostLike.user_id == body.userId
-        ).delete(
-            synchronize_session=False
-        )
-        comments = db_session.query(Comment).filter(and_(
+        user_posts_ids = select(Post.id).where(Post.user_id == body.userId)
+        liked_posts_ids = (await db_session.scalars(
+            select(PostLike.post_id).where(PostLike.user_id == body.userId)
+        )).all()
+        commented_posts_ids = (await db_session.scalars(
+            select(Comment.post_id).where(
+                Comment.user_id == body.userId
+            ).distinct()
+        )).all()
+        replied_comments_ids = (await db_session.scalars(
+            select(Comment.comment_id).where(and_(
+                Comment.user_id == body.userId,
+                Comment.comment_id != None
+            )).distinct()
+        )).all()
+        follow_edges = (await db_session.execute(
+            delete(UserFollowing).where(or_(
+                UserFollowing.follower_id == body.userId,
+                UserFollowing.following_id == body.userId
+            )).returning(
+                UserFollowing.follower_id, UserFollowing.following_id)
+        )).all()
+        likers_ids = (await db_session.scalars(
+            delete(PostLike).where(or_(
+                PostLike.user_id == body.userId,
+                PostLike.post_id.in_(user_posts_ids)
+            )).returning(PostLike.user_id)
+        )).all()
+        user_comments = subtree_cte(or_(
             Comment.user_id == body.userId,
-            Comment.comment_id == None
+            Comment.post_id.in_(user_posts_ids)
+        ))
+        commenters_ids = (await db_session.scalars(
+            delete(Comment).where(
+                Comment.id.in_(select(user_comments.c.id))
+            ).returning(Comment.user_id).execution_options(
+                synchronize_session=False
+            )
         )).all()
-        comment_ids = map(lambda x: x.id, comments)
-        db_session.query(Comment).filter(or_(
-            Comment.comment_id.in_(comment_ids),
-            Comment.user_id == body.userId
-        )).delete(
-            synchronize_session=False
-        )
-        db_session.query(Post).filter(
-            Post.user_id == body.userId
-        ).delete(
-            synchronize_session=False
-        )
-        db_session.query(User).filter(
-            User.id == body.userId
-        ).delete(
-            synchronize_session=False
-        )
-        db_session.commit()
+        await db_session.execute(
+            delete(PostScore).where(PostScore.author_id == body.userId))
+        await db_session.execute(
+            delete(Post).where(Post.user_id == body.userId))
+        await db_session.execute(
+            delete(ExploreSeen).where(ExploreSeen.user_id == body.userId))
+        await db_session.execute(delete(UserSuggestion).where(or_(
+            UserSuggestion.user_id == body.userId,
+            UserSuggestion.suggested_id == body.userId
+        )))
+        await db_session.execute(delete(SuggestionQueue).where(
+            SuggestionQueue.user_id == body.userId))
+        await db_session.execute(
+            delete(UserStats).where(UserStats.user_id == body.userId))
+        await db_session.execute(
+            delete(User).where(User.id == body.userId))
+        affected_posts_ids = set(liked_posts_ids) | set(commented_posts_ids)
+        if affected_posts_ids:
+            await db_session.execute(
+                recount_posts_stmt(list(affected_posts_ids)))
+        if replied_comments_ids:
+            await db_session.execute(
+                recount_comments_stmt(replied_comments_ids))
+        affected_users_ids = set(likers_ids) | set(commenters_ids)
+        for edge in follow_edges:
+            affected_users_ids.update(edge)
+        affected_users_ids.discard(body.userId)
+        if affected_users_ids:
+            await db_session.execute(
+                recount_user_stats_stmt(list(affected_users_ids)))
+        await publish(db_session, 'user', body.userId)
+        await publish(db_session, 'auth_user', body.userId)
+        await publish(db_session, 'author_posts', body.userId)
+        await publish(db_session, 'follow', *[
+            ' '.join(edge) for edge in follow_edges])
+        await db_session.commit()
+        user_summaries.invalidate(body.userId)
+        auth_token_cache.invalidate_user(body.userId)
+        timeline_fanout.enqueue('remove_user', user_id=body.userId)
         api_response = {
             'success': True,
             'data': {}
         }
-    finally:
-        db_session.close()
+    except Exception as ex:
+        print(ex.args[0])
+        await db_session.rollback()
     return api_response
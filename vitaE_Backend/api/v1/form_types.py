@@ -85,6 +85,12 @@ class PostLikeModel(BaseModel):
     postId: str
 
 
+class PostLikeStatusModel(BaseModel):
+    """Model to get like status of many posts"""
+    authToken: str
+    postIds: List[str]
+
+
 class CommentAddModel(BaseModel):
     """Model to add a comment"""
     authToken: str
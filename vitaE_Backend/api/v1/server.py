@@ -8,13 +8,19 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 
+from .database import config_database
 from .middlewares import config_middlewares
 from .endpoint import config_endpoints
+from .workers import config_workers
+from .utils.html_template_processor import preload_templates
 
 
 app = FastAPI()
+config_database(app)
 config_middlewares(app)
 config_endpoints(app)
+config_workers(app)
+app.add_event_handler('startup', preload_templates)
 
 
 async def handler_exceptions(request, exc):
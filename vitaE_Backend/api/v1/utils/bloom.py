@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""Module for a compact Bloom filter of string items"""
+import math
+import hashlib
+
+
+class BloomFilter:
+    """Bloom filter backed by a byte array of bits"""
+    def __init__(self, capacity: int, fp_rate: float, data: bytes = None):
+        """Initializing BloomFilter class"""
+        capacity = max(capacity, 1)
+        bits_count = math.ceil(
+            -capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        self.bytes_count = (bits_count + 7) // 8
+        self.bits_count = self.bytes_count * 8
+        self.hashes_count = max(
+            1, round(self.bits_count / capacity * math.log(2)))
+        if data is not None and len(data) == self.bytes_count:
+            self.bits = bytearray(data)
+        else:
+            self.bits = bytearray(self.bytes_count)
+
+    def positions(self, item: str):
+        """Get bit positions of an item with double hashing"""
+        digest = hashlib.blake2b(
+            bytes(item, 'utf-8'), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return (
+            (first_hash + indx * second_hash) % self.bits_count
+            for indx in range(self.hashes_count)
+        )
+
+    def add(self, item: str):
+        """Add an item to the filter"""
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str):
+        """Checking if an item may have been added to the filter"""
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+    def to_bytes(self):
+        """Get the bits of the filter as bytes"""
+        return bytes(self.bits)
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""Module for recursive queries over comment reply trees"""
+from sqlalchemy import select, literal
+
+from ..database import Comment
+
+
+MAX_THREAD_DEPTH = 5
+"""Deepest level of nested replies prefetched with a thread"""
+
+MAX_THREAD_ROWS = 500
+"""Largest number of nested replies prefetched with a thread"""
+
+
+def subtree_cte(root_condition, max_depth=None):
+    """Create recursive CTE of matching comments and their nested replies"""
+    subtree = select(
+        Comment.id, literal(0).label('level')
+    ).where(root_condition).cte('subtree', recursive=True)
+    replies = select(
+        Comment.id, (subtree.c.level + 1).label('level')
+    ).join(subtree, Comment.comment_id == subtree.c.id)
+    if max_depth is not None:
+        replies = replies.where(subtree.c.level < max_depth)
+    return subtree.union_all(replies)
+
+
+def nested_replies_query(parents_ids, depth: int):
+    """Create query of replies under parent comments up to a depth"""
+    subtree = subtree_cte(Comment.id.in_(parents_ids), depth)
+    return select(Comment).join(
+        subtree, subtree.c.id == Comment.id
+    ).where(subtree.c.level > 0).order_by(
+        subtree.c.level, Comment.created_on, Comment.id
+    ).limit(MAX_THREAD_ROWS)
+
+
+def nest_replies(comments_data, replies, authors, details_fxn):
+    """Attach replies to their parents as nested lists"""
+    comments_index = {}
+    for comment_info in comments_data:
+        comment_info['replies'] = []
+        comments_index[comment_info['id']] = comment_info
+    for comment in replies:
+        parent_info = comments_index.get(comment.comment_id)
+        if parent_info is None or comment.user_id not in authors:
+            continue
+        reply_info = details_fxn(comment, authors[comment.user_id])
+        reply_info['replies'] = []
+        parent_info['replies'].append(reply_info)
+        comments_index[reply_info['id']] = reply_info
+    return comments_data
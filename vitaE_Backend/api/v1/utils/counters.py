@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""Module for recomputing denormalized counters from source rows"""
+from sqlalchemy import and_, select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from ..database import (
+    Comment, Post, PostLike, User, UserFollowing, UserStats)
+
+
+USER_STATS_COLUMNS = [
+    'user_id',
+    'followers_count',
+    'followings_count',
+    'posts_count',
+    'likes_count',
+    'comments_count',
+    'updated_on'
+]
+"""Columns written when profile counters are recomputed"""
+
+
+def recount_posts_stmt(post_ids=None):
+    """Create statement recomputing like and comment counters of posts"""
+    likes_count = select(func.count()).select_from(PostLike).where(
+        PostLike.post_id == Post.id
+    ).scalar_subquery()
+    comments_count = select(func.count()).select_from(Comment).where(and_(
+        Comment.post_id == Post.id,
+        Comment.comment_id == None
+    )).scalar_subquery()
+    stmt = update(Post).values(
+        likes_count=likes_count,
+        comments_count=comments_count
+    )
+    if post_ids is not None:
+        stmt = stmt.where(Post.id.in_(post_ids))
+    return stmt.execution_options(synchronize_session=False)
+
+
+def recount_comments_stmt(comment_ids=None):
+    """Create statement recomputing reply counters of comments"""
+    reply = aliased(Comment)
+    replies_count = select(func.count()).select_from(reply).where(
+        reply.comment_id == Comment.id
+    ).scalar_subquery()
+    stmt = update(Comment).values(replies_count=replies_count)
+    if comment_ids is not None:
+        stmt = stmt.where(Comment.id.in_(comment_ids))
+    return stmt.execution_options(synchronize_session=False)
+
+
+def shift_user_stats_stmt(user_id: str, **shifts):
+    """Create statement shifting profile counters of a user"""
+    stmt = insert(UserStats).values(
+        user_id=user_id,
+        updated_on=func.now(),
+        **{name: max(shift, 0) for name, shift in shifts.items()}
+    )
+    stats_values = {
+        name: getattr(UserStats, name) + shift
+        for name, shift in shifts.items()
+    }
+    stats_values['updated_on'] = stmt.excluded.updated_on
+    return stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_=stats_values
+    )
+
+
+def count_of(model, condition):
+    """Create correlated count of rows matching a condition"""
+    return select(func.count()).select_from(model).where(
+        condition).scalar_subquery()
+
+
+def recount_user_stats_stmt(user_ids=None):
+    """Create statement recomputing profile counters of users"""
+    users_stats = select(
+        User.id,
+        count_of(UserFollowing, UserFollowing.following_id == User.id),
+        count_of(UserFollowing, UserFollowing.follower_id == User.id),
+        count_of(Post, Post.user_id == User.id),
+        count_of(PostLike, PostLike.user_id == User.id),
+        count_of(Comment, Comment.user_id == User.id),
+        func.now()
+    )
+    if user_ids is not None:
+        users_stats = users_stats.where(User.id.in_(user_ids))
+    stmt = insert(UserStats).from_select(USER_STATS_COLUMNS, users_stats)
+    return stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            name: getattr(stmt.excluded, name)
+            for name in USER_STATS_COLUMNS[1:]
+        }
+    )
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Module for remembering explore posts already served to users"""
+import os
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import ExploreSeen
+from .bloom import BloomFilter
+
+
+def get_seen_settings():
+    """Get capacity and false-positive rate of seen filters"""
+    seen_settings = {
+        'capacity': int(os.getenv('EXPLORE_SEEN_CAPACITY', '2000')),
+        'fp_rate': float(os.getenv('EXPLORE_SEEN_FP_RATE', '0.01'))
+    }
+    return seen_settings
+
+
+class SeenPosts:
+    """Rotating pair of Bloom filters of posts served to a user"""
+    def __init__(self, user_id: str, current_bits=None, previous_bits=None,
+                 current_count=0):
+        """Initializing SeenPosts class"""
+        seen_settings = get_seen_settings()
+        self.user_id = user_id
+        self.capacity = seen_settings['capacity']
+        self.fp_rate = seen_settings['fp_rate']
+        self.current = BloomFilter(
+            self.capacity, self.fp_rate, current_bits)
+        self.previous = None
+        if previous_bits is not None:
+            self.previous = BloomFilter(
+                self.capacity, self.fp_rate, previous_bits)
+        self.current_count = current_count
+
+    def __contains__(self, post_id: str):
+        """Checking if a post was probably served to the user"""
+        if post_id in self.current:
+            return True
+        return self.previous is not None and post_id in self.previous
+
+    def add_many(self, posts_ids):
+        """Record served posts, rotating the filters when full"""
+        for post_id in posts_ids:
+            if self.current_count >= self.capacity:
+                self.previous = self.current
+                self.current = BloomFilter(self.capacity, self.fp_rate)
+                self.current_count = 0
+            self.current.add(post_id)
+            self.current_count += 1
+
+    @staticmethod
+    async def load(db_session: AsyncSession, user_id: str):
+        """Load the seen filters of a user"""
+        seen_row = await db_session.scalar(
+            select(ExploreSeen).where(ExploreSeen.user_id == user_id))
+        if seen_row is None:
+            return SeenPosts(user_id)
+        return SeenPosts(
+            user_id,
+            seen_row.current_bits,
+            seen_row.previous_bits,
+            seen_row.current_count
+        )
+
+    async def save(self, db_session: AsyncSession):
+        """Write the seen filters of the user back to the database"""
+        seen_values = {
+            'current_bits': self.current.to_bytes(),
+            'previous_bits': (
+                self.previous.to_bytes() if self.previous else None),
+            'current_count': self.current_count,
+            'updated_on': datetime.utcnow()
+        }
+        await db_session.execute(
+            insert(ExploreSeen).values(
+                user_id=self.user_id, **seen_values
+            ).on_conflict_do_update(
+                index_elements=[ExploreSeen.user_id],
+                set_=seen_values
+            )
+        )
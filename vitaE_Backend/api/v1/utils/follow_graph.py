@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+"""Module for a per-process cache of the follow graph"""
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import UserFollowing
+from .metrics import incr_counter, register_gauge
+
+
+def contains_sorted(items: array, item: int):
+    """Checking if a sorted array holds an item with a binary search"""
+    indx = bisect_left(items, item)
+    return indx < len(items) and items[indx] == item
+
+
+def intersect_sorted(first: array, second: array):
+    """Get items held by two sorted arrays"""
+    if len(first) > len(second):
+        first, second = second, first
+    if len(first) * 8 < len(second):
+        return array('I', (x for x in first if contains_sorted(second, x)))
+    common = array('I')
+    first_indx = second_indx = 0
+    while first_indx < len(first) and second_indx < len(second):
+        if first[first_indx] < second[second_indx]:
+            first_indx += 1
+        elif first[first_indx] > second[second_indx]:
+            second_indx += 1
+        else:
+            common.append(first[first_indx])
+            first_indx += 1
+            second_indx += 1
+    return common
+
+
+class FollowGraph:
+    """LRU cache of following and follower sets as sorted dense ids"""
+    def __init__(self):
+        """Initializing FollowGraph class"""
+        self.dense_ids = {}
+        self.users_ids = []
+        self.followings = OrderedDict()
+        self.followers = OrderedDict()
+        self.edges_count = 0
+        self.entries_bytes = 0
+        self.ids_bytes = 0
+        self.live_ids = 0
+        self.generation = 0
+        self.max_edges = int(os.getenv('FOLLOW_GRAPH_MAX_EDGES', '5000000'))
+        self.compact_ids = int(
+            os.getenv('FOLLOW_GRAPH_COMPACT_IDS', '100000'))
+        self.ttl = float(os.getenv('FOLLOW_GRAPH_TTL', '60'))
+        register_gauge('follow_graph.edges', lambda: self.edges_count)
+        register_gauge('follow_graph.users', lambda: len(self.users_ids))
+        register_gauge('follow_graph.bytes', self.memory_bytes)
+        register_gauge(
+            'follow_graph.bytes_per_million_edges',
+            lambda: self.memory_bytes() * 1000000 // max(self.edges_count, 1)
+        )
+
+    @staticmethod
+    def entry_bytes(dense_id: int, entry: tuple):
+        """Get bytes held by a cached set and its key"""
+        return (sys.getsizeof(dense_id) + sys.getsizeof(entry) +
+                sys.getsizeof(entry[0]) + sys.getsizeof(entry[1]))
+
+    def dense_id(self, user_id: str):
+        """Get the dense integer id of a user, assigning one if needed"""
+        dense_id = self.dense_ids.get(user_id)
+        if dense_id is None:
+            dense_id = len(self.users_ids)
+            self.dense_ids[user_id] = dense_id
+            self.users_ids.append(user_id)
+            self.ids_bytes += sys.getsizeof(user_id) + sys.getsizeof(dense_id)
+        return dense_id
+
+    def memory_bytes(self):
+        """Get bytes held by the cached sets and the id map"""
+        containers = (
+            self.dense_ids, self.users_ids, self.followings, self.followers)
+        return (self.entries_bytes + self.ids_bytes +
+                sum(sys.getsizeof(container) for container in containers))
+
+    def invalidate(self, follower_id: str, following_id: str):
+        """Drop cached sets touched by a follow edge"""
+        self.drop(self.followings, self.dense_ids.get(follower_id))
+        self.drop(self.followers, self.dense_ids.get(following_id))
+
+    def clear(self):
+        """Drop all cached sets and dense ids"""
+        self.followings.clear()
+        self.followers.clear()
+        self.dense_ids = {}
+        self.users_ids = []
+        self.edges_count = 0
+        self.entries_bytes = 0
+        self.ids_bytes = 0
+        self.live_ids = 0
+        self.generation += 1
+
+    def store(self, cache: OrderedDict, dense_id: int, entry: tuple):
+        """Add a cached set and its edges to the count"""
+        self.drop(cache, dense_id)
+        cache[dense_id] = entry
+        self.edges_count += len(entry[1])
+        self.entries_bytes += self.entry_bytes(dense_id, entry)
+
+    def drop(self, cache: OrderedDict, dense_id):
+        """Remove a cached set and its edges from the count"""
+        entry = cache.pop(dense_id, None) if dense_id is not None else None
+        if entry is not None:
+            self.edges_count -= len(entry[1])
+            self.entries_bytes -= self.entry_bytes(dense_id, entry)
+
+    async def get_sets(self, db_session: AsyncSession, cache: OrderedDict,
+                       key_column, value_column, users_ids):
+        """Get sorted adjacency arrays of users, loading misses at once"""
+        currnttime = time.monotonic()
+        generation = self.generation
+        adjacency = {}
+        misses_ids = []
+        for user_id in users_ids:
+            entry = cache.get(self.dense_ids.get(user_id))
+            if entry and entry[0] > currnttime:
+                cache.move_to_end(self.dense_ids[user_id])
+                adjacency[user_id] = entry[1]
+            else:
+                misses_ids.append(user_id)
+        incr_counter('follow_graph.hits', len(adjacency))
+        incr_counter('follow_graph.misses', len(misses_ids))
+        if not misses_ids:
+            return adjacency
+        edges_rows = (await db_session.execute(
+            select(key_column, value_column).where(
+                key_column.in_(misses_ids))
+        )).all()
+        if generation != self.generation:
+            incr_counter('follow_graph.retries')
+            return await self.get_sets(
+                db_session, cache, key_column, value_column, users_ids)
+        loaded = {user_id: [] for user_id in misses_ids}
+        for key_id, value_id in edges_rows:
+            loaded[key_id].append(self.dense_id(value_id))
+        for user_id, dense_values in loaded.items():
+            dense_values.sort()
+            values_array = array('I', dense_values)
+            self.store(cache, self.dense_id(user_id),
+                       (currnttime + self.ttl, values_array))
+            adjacency[user_id] = values_array
+        self.evict()
+        return self.compact(adjacency)
+
+    def evict(self):
+        """Evict least recently used sets beyond the edges budget"""
+        while self.edges_count > self.max_edges and (
+                self.followings or self.followers):
+            cache = self.followings
+            if len(self.followers) > len(self.followings):
+                cache = self.followers
+            self.drop(cache, next(iter(cache)))
+            incr_counter('follow_graph.evictions')
+
+    def compact(self, adjacency: dict):
+        """Renumber dense ids to the ones still referenced by cached sets"""
+        if len(self.users_ids) < max(self.compact_ids, 2 * self.live_ids):
+            return adjacency
+        live_ids = set()
+        for cache in (self.followings, self.followers):
+            for dense_id, entry in cache.items():
+                live_ids.add(dense_id)
+                live_ids.update(entry[1])
+        for user_id, values_array in adjacency.items():
+            live_ids.add(self.dense_ids[user_id])
+            live_ids.update(values_array)
+        old_ids = sorted(live_ids)
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(old_ids)}
+        users_ids = [self.users_ids[old_id] for old_id in old_ids]
+        entries = [
+            (cache, list(cache.items()))
+            for cache in (self.followings, self.followers)
+        ]
+        self.clear()
+        for user_id in users_ids:
+            self.dense_id(user_id)
+        for cache, cache_entries in entries:
+            for dense_id, entry in cache_entries:
+                self.store(cache, new_ids[dense_id], (entry[0], array(
+                    'I', (new_ids[old_id] for old_id in entry[1]))))
+        self.live_ids = len(self.users_ids)
+        incr_counter('follow_graph.compactions')
+        compacted = {
+            user_id: array('I', (new_ids[old_id] for old_id in values_array))
+            for user_id, values_array in adjacency.items()
+        }
+        return compacted
+
+    async def followings_of(self, db_session: AsyncSession, users_ids):
+        """Get sorted dense ids followed by each of the users"""
+        return await self.get_sets(
+            db_session, self.followings, UserFollowing.follower_id,
+            UserFollowing.following_id, users_ids
+        )
+
+    async def followers_of(self, db_session: AsyncSession, users_ids):
+        """Get sorted dense ids following each of the users"""
+        return await self.get_sets(
+            db_session, self.followers, UserFollowing.following_id,
+            UserFollowing.follower_id, users_ids
+        )
+
+    async def following_flags(self, db_session: AsyncSession,
+                              viewer_id: str, users_ids):
+        """Get whether a viewer follows each of the users"""
+        if not viewer_id:
+            return {user_id: False for user_id in users_ids}
+        followings = (await self.followings_of(
+            db_session, [viewer_id]))[viewer_id]
+        return {
+            user_id: contains_sorted(
+                followings, self.dense_ids.get(user_id, -1))
+            for user_id in users_ids
+        }
+
+    async def is_following(self, db_session: AsyncSession,
+                           follower_id: str, user_id: str):
+        """Checking if a user follows another user"""
+        return (await self.following_flags(
+            db_session, follower_id, [user_id]))[user_id]
+
+    async def common_followings(self, db_session: AsyncSession,
+                                viewer_id: str, users_ids):
+        """Get ids of the given users that a viewer follows"""
+        followings = (await self.followings_of(
+            db_session, [viewer_id]))[viewer_id]
+        candidates = array('I', sorted(
+            self.dense_ids[user_id] for user_id in users_ids
+            if user_id in self.dense_ids))
+        return [
+            self.users_ids[dense_id]
+            for dense_id in intersect_sorted(followings, candidates)
+        ]
+
+
+follow_graph = FollowGraph()
+"""Process-wide follow-graph cache"""
@@ -1,19 +1,43 @@
 #!/usr/bin/python3
 """Module for HTML template rendering with dynamic content"""
 import os
-from jinja2 import Template
+from functools import lru_cache
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    TemplateNotFound
+)
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), '..', 'templates')
+"""Directory of the email templates"""
+
+
+@lru_cache(maxsize=1)
+def get_environment():
+    """Get the template environment, creating it once"""
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        bytecode_cache=FileSystemBytecodeCache(
+            os.getenv('TEMPLATE_CACHE_DIR') or None),
+        auto_reload=False
+    )
+    environment.globals['frontend_domain'] = os.getenv('FRONTEND_DOMAIN')
+    return environment
+
+
+def preload_templates():
+    """Compile all templates so the first render does not pay for it"""
+    environment = get_environment()
+    for template_name in environment.list_templates(extensions=['html']):
+        environment.get_template(template_name)
 
 
 def html_template_render(template_name, **context):
     """Create HTML string based on template and context"""
-    template_path = os.path.join(
-        'api', 'v1', 'templates', f'{template_name}.html'
-    )
-    html_rendered = ''
-    if os.path.isfile(template_path):
-        frontend_domain = os.getenv('FRONTEND_DOMAIN')
-        context['frontend_domain'] = frontend_domain
-        with open(template_path) as file:
-            doc = Template(file.read())
-            html_rendered = doc.render(**context)
-    return html_rendered
+    try:
+        template = get_environment().get_template(f'{template_name}.html')
+    except TemplateNotFound:
+        return ''
+    return template.render(**context)
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+"""Module for merging pulled posts of popular authors into feeds"""
+import os
+import time
+import heapq
+from itertools import islice
+from collections import OrderedDict
+from sqlalchemy import select, true, values, column, String
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import Post, UserStats
+from .metrics import incr_counter, register_gauge
+from .follow_graph import follow_graph
+
+
+def get_fanout_threshold():
+    """Get follower count above which authors are pulled at read time"""
+    return int(os.getenv('FEED_FANOUT_THRESHOLD', '10000'))
+
+
+class PullAuthors:
+    """Registry of authors whose posts are merged at read time"""
+    def __init__(self):
+        """Initializing PullAuthors class"""
+        self.authors_ids = frozenset()
+        register_gauge('feed.pull_authors', lambda: len(self.authors_ids))
+
+    def __contains__(self, author_id):
+        """Checking if an author is pulled at read time"""
+        return author_id in self.authors_ids
+
+    async def refresh(self, db_session: AsyncSession):
+        """Reload pulled authors and return the ones that left the set"""
+        authors_ids = frozenset((await db_session.scalars(
+            select(UserStats.user_id).where(
+                UserStats.followers_count > get_fanout_threshold())
+        )).all())
+        left_ids = self.authors_ids - authors_ids
+        self.authors_ids = authors_ids
+        return left_ids
+
+    async def followed_by(self, db_session: AsyncSession, viewer_id: str):
+        """Get pulled authors followed by a viewer"""
+        if not self.authors_ids:
+            return []
+        return await follow_graph.common_followings(
+            db_session, viewer_id, self.authors_ids)
+
+
+def recent_posts_query(authors_ids, depth: int):
+    """Create lateral query of the newest posts of each author"""
+    authors = values(
+        column('author_id', String(64)), name='authors'
+    ).data([(author_id,) for author_id in authors_ids])
+    recent = select(Post.id, Post.created_on).where(
+        Post.user_id == authors.c.author_id
+    ).order_by(
+        Post.created_on.desc(), Post.id.desc()
+    ).limit(depth).lateral('recent')
+    return select(
+        authors.c.author_id, recent.c.created_on, recent.c.id
+    ).select_from(authors).join(recent, true())
+
+
+class RecentPosts:
+    """LRU cache of the newest posts of pulled authors"""
+    def __init__(self):
+        """Initializing RecentPosts class"""
+        self.entries = OrderedDict()
+        self.max_authors = int(os.getenv('FEED_RECENT_AUTHORS', '10000'))
+        self.ttl = float(os.getenv('FEED_RECENT_POSTS_TTL', '60'))
+
+    def invalidate(self, author_id: str):
+        """Remove cached posts of an author"""
+        self.entries.pop(author_id, None)
+
+    def clear(self):
+        """Remove cached posts of all authors"""
+        self.entries.clear()
+
+    async def get_many(self, db_session: AsyncSession, authors_ids):
+        """Get newest-first (created_on, post_id) lists of authors"""
+        currnttime = time.monotonic()
+        recent_posts = {}
+        misses_ids = []
+        for author_id in authors_ids:
+            entry = self.entries.get(author_id)
+            if entry and entry[0] > currnttime:
+                self.entries.move_to_end(author_id)
+                recent_posts[author_id] = entry[1]
+            else:
+                misses_ids.append(author_id)
+        incr_counter('feed.recent_posts_hits', len(recent_posts))
+        incr_counter('feed.recent_posts_misses', len(misses_ids))
+        if misses_ids:
+            loaded = await self.load(db_session, misses_ids)
+            for author_id in misses_ids:
+                posts_keys = loaded.get(author_id, [])
+                recent_posts[author_id] = posts_keys
+                self.entries[author_id] = (currnttime + self.ttl, posts_keys)
+                self.entries.move_to_end(author_id)
+            while len(self.entries) > self.max_authors:
+                self.entries.popitem(last=False)
+        return recent_posts
+
+    async def load(self, db_session: AsyncSession, authors_ids):
+        """Load newest posts of authors with one lateral query"""
+        depth = int(os.getenv('FEED_RECENT_POSTS_DEPTH', '200'))
+        rows = (await db_session.execute(
+            recent_posts_query(authors_ids, depth))).all()
+        loaded = {}
+        for row in rows:
+            loaded.setdefault(row.author_id, []).append(
+                (row.created_on, row.id))
+        for posts_keys in loaded.values():
+            posts_keys.sort(reverse=True)
+        return loaded
+
+
+def merge_feed_keys(timeline_keys, authors_keys, span, before='',
+                    cursor_key=None):
+    """Merge timeline and pulled post keys with a k-way heap merge"""
+    scan_desc = not before
+    sources = [timeline_keys]
+    for posts_keys in authors_keys:
+        if cursor_key is not None:
+            if scan_desc:
+                posts_keys = [x for x in posts_keys if x < cursor_key]
+            else:
+                posts_keys = [x for x in posts_keys if x > cursor_key]
+        if not scan_desc:
+            posts_keys = posts_keys[::-1]
+        sources.append(posts_keys[:span + 1])
+    merged = heapq.merge(*sources, reverse=scan_desc)
+    seen_ids = set()
+    unique_keys = (
+        x for x in merged
+        if x[1] not in seen_ids and not seen_ids.add(x[1])
+    )
+    return list(islice(unique_keys, span + 1))
+
+
+pull_authors = PullAuthors()
+"""Process-wide registry of pulled authors"""
+
+recent_posts = RecentPosts()
+"""Process-wide cache of recent posts of pulled authors"""
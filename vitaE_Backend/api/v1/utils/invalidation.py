@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+"""Module for publishing cache invalidation events between workers"""
+import json
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .metrics import incr_counter
+
+
+INVALIDATION_CHANNEL = 'vitae_invalidation'
+"""Postgres channel carrying cache invalidation events"""
+
+KEYS_PER_EVENT = 64
+"""Largest number of keys sent in one notification payload"""
+
+
+def encode_event(kind: str, keys):
+    """Encode an invalidation event into a notification payload"""
+    return json.JSONEncoder(separators=(',', ':')).encode(
+        {'kind': kind, 'keys': list(keys)})
+
+
+def decode_event(payload: str):
+    """Decode a notification payload into kind and keys"""
+    event = json.JSONDecoder().decode(payload)
+    return event['kind'], event['keys']
+
+
+async def publish(db_session: AsyncSession, kind: str, *keys):
+    """Queue invalidation events sent when the transaction commits"""
+    for indx in range(0, len(keys), KEYS_PER_EVENT):
+        await db_session.execute(select(func.pg_notify(
+            INVALIDATION_CHANNEL,
+            encode_event(kind, keys[indx:indx + KEYS_PER_EVENT])
+        )))
+        incr_counter('invalidation.published')
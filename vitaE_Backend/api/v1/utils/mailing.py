@@ -1,14 +1,22 @@
 #!/usr/bin/python3
-"""Module for sending emails via Gmail API"""
+"""Module for queueing emails and sending them through a transport"""
 import os
+import time
 import base64
+import smtplib
+import threading
+import httplib2
+from functools import lru_cache
+from datetime import datetime, timezone
 from email.mime.text import MIMEText
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.errors import HttpError
 from googleapiclient.discovery import build
 
+from ..database import EmailOutbox
+
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 """Scopes required for sending emails"""
 
@@ -34,37 +42,179 @@ def get_gmail_credentials():
     return api_credn
 
 
-def create_email_message(recipient, subject, body_html):
+def create_mime_message(recipient, subject, body_html):
     """Create MIME message for email"""
     message = MIMEText(body_html, 'html', 'utf-8')
     message['to'] = recipient
     message['from'] = os.getenv('GMAIL_SENDER')
     message['subject'] = subject
+    return message
+
+
+def create_email_message(recipient, subject, body_html):
+    """Create Gmail API body of an email"""
+    message = create_mime_message(recipient, subject, body_html)
     encoded_message = {'raw': base64.urlsafe_b64encode(
         bytes(message.as_string(), 'utf-8')).decode('utf-8')
     }
     return encoded_message
 
 
-def send_email(service, message):
-    """Sending messages witn email using Gmail API"""
-    try:
-        gmail_credn = get_gmail_credentials()
-        service = build('gmail', 'v1', credentials=gmail_credn)
-        message = (service.users().messages().send(userId='me', body=message)
-                   .execute())
-        print(f"Message Id: {message['id']}")
+class EmailTransport:
+    """Base email transport sending emails one at a time"""
+    def send(self, recipient, subject, body_html):
+        """Send an email, raising on delivery errors"""
+        raise NotImplementedError()
+
+    def send_many(self, emails):
+        """Send (recipient, subject, body_html) emails, returning errors"""
+        errors = []
+        for recipient, subject, body_html in emails:
+            try:
+                self.send(recipient, subject, body_html)
+                errors.append(None)
+            except Exception as ex:
+                errors.append(ex)
+        return errors
+
+
+class GmailTransport(EmailTransport):
+    """Email transport sending with a long-lived Gmail API client"""
+    def __init__(self):
+        """Initializing GmailTransport class"""
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.credentials = None
+        self.service = None
+        self.batch_size = int(os.getenv('GMAIL_BATCH_SIZE', '50'))
+
+    def get_service(self):
+        """Get the Gmail service with valid credentials, building it once"""
+        with self.lock:
+            if self.credentials is None:
+                self.credentials = get_gmail_credentials()
+            elif not self.credentials.valid:
+                self.credentials.refresh(Request())
+            if self.service is None:
+                self.service = build(
+                    'gmail', 'v1',
+                    credentials=self.credentials,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+        return self.service
+
+    def get_http(self):
+        """Get the authorized HTTP connection of the current thread"""
+        http = getattr(self.local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=30))
+            self.local.http = http
+        return http
+
+    def send(self, recipient, subject, body_html):
+        """Send an email, raising on delivery errors"""
+        service = self.get_service()
+        message = service.users().messages().send(
+            userId='me',
+            body=create_email_message(recipient, subject, body_html)
+        ).execute(http=self.get_http())
         return message
-    except HttpError as error:
-        print(f'An error occured: {error}')
-
-
-def deliver_message(dest, subject, body_html):
-    """Deliver to destination user the message"""
-    try:
-        api_credn = get_gmail_credentials()
-        service = build('gmail', 'v1', credentials=api_credn)
-        message = create_email_message(dest, subject, body_html)
-        send_email(service, message)
-    except HttpError as error:
-        print(f'An error occurred: {error}')
+
+    def send_many(self, emails):
+        """Send emails with Gmail batch requests, returning errors"""
+        if len(emails) == 1:
+            return super().send_many(emails)
+        try:
+            service = self.get_service()
+        except Exception as ex:
+            return [ex] * len(emails)
+        no_response = ConnectionError('No response in the Gmail batch.')
+        errors = [no_response] * len(emails)
+
+        def record_outcome(request_id, response, exception):
+            """Keep the outcome of a send that got a response"""
+            errors[int(request_id)] = exception
+        for start in range(0, len(emails), self.batch_size):
+            batch = service.new_batch_http_request(callback=record_outcome)
+            batch_ids = []
+            for idx, email in enumerate(
+                    emails[start:start + self.batch_size], start):
+                try:
+                    batch.add(service.users().messages().send(
+                        userId='me',
+                        body=create_email_message(*email)
+                    ), request_id=str(idx))
+                    batch_ids.append(idx)
+                except Exception as ex:
+                    errors[idx] = ex
+            if not batch_ids:
+                continue
+            try:
+                batch.execute(http=self.get_http())
+            except Exception as ex:
+                for idx in batch_ids:
+                    if errors[idx] is no_response:
+                        errors[idx] = ex
+        return errors
+
+
+class FileTransport(EmailTransport):
+    """Email transport writing messages to a local directory"""
+    def __init__(self):
+        """Initializing FileTransport class"""
+        self.directory = os.getenv('EMAIL_FILE_DIR', 'sent_emails')
+
+    def send(self, recipient, subject, body_html):
+        """Write an email as an .eml file"""
+        os.makedirs(self.directory, exist_ok=True)
+        message = create_mime_message(recipient, subject, body_html)
+        file_path = os.path.join(
+            self.directory, f'{time.time_ns()}-{recipient}.eml')
+        with open(file_path, 'w') as email_file:
+            email_file.write(message.as_string())
+        return file_path
+
+
+class SmtpTransport(EmailTransport):
+    """Email transport sending to an SMTP server"""
+    def __init__(self):
+        """Initializing SmtpTransport class"""
+        self.host = os.getenv('SMTP_HOST', 'localhost')
+        self.port = int(os.getenv('SMTP_PORT', '1025'))
+
+    def send(self, recipient, subject, body_html):
+        """Send an email, raising on delivery errors"""
+        message = create_mime_message(recipient, subject, body_html)
+        with smtplib.SMTP(self.host, self.port, timeout=30) as server:
+            server.send_message(message)
+
+
+EMAIL_TRANSPORTS = {
+    'gmail': GmailTransport,
+    'file': FileTransport,
+    'smtp': SmtpTransport
+}
+"""Email transports selectable with EMAIL_TRANSPORT"""
+
+
+@lru_cache(maxsize=1)
+def get_transport():
+    """Get the configured email transport, creating it once"""
+    return EMAIL_TRANSPORTS[os.getenv('EMAIL_TRANSPORT', 'gmail')]()
+
+
+def queue_message(db_session, dest, subject, body_html):
+    """Add an email to the outbox in the transaction of the session"""
+    currnttime = datetime.now(timezone.utc)
+    db_session.add(EmailOutbox(
+        recipient=dest,
+        subject=subject,
+        body_html=body_html,
+        status='pending',
+        attempts=0,
+        last_error='',
+        created_on=currnttime,
+        next_attempt_on=currnttime
+    ))
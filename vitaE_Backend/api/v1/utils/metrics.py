@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+"""Module for in-process counters and gauges of the API"""
+import threading
+
+
+_metrics_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def incr_counter(name: str, value=1):
+    """Increase a named counter by the given value"""
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_gauge(name: str, gauge_fxn):
+    """Register a callable reporting the current value of a gauge"""
+    with _metrics_lock:
+        _gauges[name] = gauge_fxn
+
+
+def metrics_snapshot():
+    """Create and return a copy of all counters and gauge values"""
+    with _metrics_lock:
+        snapshot = dict(_counters)
+        gauges = list(_gauges.items())
+    for name, gauge_fxn in gauges:
+        try:
+            snapshot[name] = gauge_fxn()
+        except Exception:
+            snapshot[name] = None
+    return snapshot
@@ -1,6 +1,14 @@
 #!/usr/bin/python3
-"""Module for extraction and slicing of list segments"""
+"""Module for keyset navigation and slicing of list segments"""
 import re
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+MAX_SPAN = 100
+"""Largest number of items returned in a single page"""
 
 
 def slice_range(range_str: str, items: list):
@@ -20,33 +28,81 @@ def slice_range(range_str: str, items: list):
     return items[start: end]
 
 
-def paginate_list(items=[], span=12, after=None, before=None,
-                  top_pop=False, key_fxn=lambda k: k['id']):
-    """Navigate list of items with optional key-based filtering"""
-    result = []
+def parse_span(span: str, default=12):
+    """Convert span string to a page size, None if it is invalid"""
+    span = span.strip() if span else ''
+    if span and re.fullmatch(r'\d+', span) is None:
+        return None
+    span = int(span if span else default)
+    return min(span, MAX_SPAN)
+
+
+def encode_cursor(sort_value, row_id: str) -> str:
+    """Encode sort value and row id into an opaque cursor string"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    cursor_txt = json.JSONEncoder(separators=(',', ':')).encode(
+        [sort_value, row_id]
+    )
+    cursor = base64.urlsafe_b64encode(bytes(cursor_txt, 'utf-8'))
+    return cursor.decode('utf-8').rstrip('=')
+
+
+def decode_cursor(cursor: str, value_type=datetime):
+    """Decode an opaque cursor string into sort value and row id"""
+    try:
+        cursor_txt = base64.urlsafe_b64decode(
+            bytes(cursor + '=' * (-len(cursor) % 4), 'utf-8')
+        ).decode('utf-8')
+        sort_value, row_id = json.JSONDecoder().decode(cursor_txt)
+        if value_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        else:
+            sort_value = value_type(sort_value)
+    except Exception:
+        raise ValueError('Invalid cursor.')
+    if type(row_id) is not str:
+        raise ValueError('Invalid cursor.')
+    return sort_value, row_id
+
+
+def keyset_select(stmt, sort_column, id_column, span, after='', before='',
+                  descending=True, value_type=datetime):
+    """Add cursor bounds, ordering and a limit of span + 1 to a select"""
     if after and before:
-        return result
-    elif after:
-        add_item = False
-        count = 0
-        for item in items:
-            if add_item:
-                result.append(item)
-                count += 1
-                if count == span:
-                    break
-            elif key_fxn(item):
-                add_item = True
-    elif before:
-        count = 0
-        for item in items:
-            if key_fxn(item):
-                break
-            else:
-                count += 1
-        start = count - (span + 1) if count > (span + 1) else 0
-        end = count - 1 if count > 1 else 0
-        result = items[start:end]
+        raise ValueError('Only one of after and before is allowed.')
+    scan_desc = descending != bool(before)
+    cursor = after or before
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, value_type)
+        row_key = tuple_(sort_column, id_column)
+        if scan_desc:
+            stmt = stmt.where(row_key < (sort_value, row_id))
+        else:
+            stmt = stmt.where(row_key > (sort_value, row_id))
+    if scan_desc:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
     else:
-        result = items[0:span] if top_pop else items[-span:]
-    return result
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+    return stmt.limit(span + 1)
+
+
+def keyset_page(rows, span, after='', before='',
+                key_fxn=lambda x: (x.created_on, x.id)):
+    """Trim rows of a keyset select and create next and prev cursors"""
+    has_more = len(rows) > span
+    rows = list(rows[:span])
+    next_cursor = ''
+    prev_cursor = ''
+    if before:
+        rows.reverse()
+    if rows:
+        first_key = key_fxn(rows[0])
+        last_key = key_fxn(rows[-1])
+        if before:
+            next_cursor = encode_cursor(*last_key)
+            prev_cursor = encode_cursor(*first_key) if has_more else ''
+        else:
+            next_cursor = encode_cursor(*last_key) if has_more else ''
+            prev_cursor = encode_cursor(*first_key) if after else ''
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""Module for hashing and verifying passwords off the event loop"""
+import os
+import asyncio
+import argon2
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .metrics import incr_counter, register_gauge
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool queue is full"""
+
+
+@lru_cache(maxsize=1)
+def get_hasher():
+    """Get the argon2 hasher of the configured cost parameters"""
+    hasher = argon2.PasswordHasher(
+        time_cost=int(os.getenv('ARGON2_TIME_COST', '3')),
+        memory_cost=int(os.getenv('ARGON2_MEMORY_COST', '65536')),
+        parallelism=int(os.getenv('ARGON2_PARALLELISM', '4'))
+    )
+    return hasher
+
+
+def compute_hash(password: str):
+    """Hash a password with the configured parameters"""
+    return get_hasher().hash(password)
+
+
+def check_password(hashed_password: str, password: str):
+    """Verify a password, returning its new hash if it needs rehashing"""
+    hasher = get_hasher()
+    try:
+        hasher.verify(hashed_password, password)
+    except argon2.exceptions.VerificationError:
+        return False, ''
+    if hasher.check_needs_rehash(hashed_password):
+        return True, hasher.hash(password)
+    return True, ''
+
+
+class PasswordPool:
+    """Bounded pool of thread or process workers running argon2"""
+    def __init__(self):
+        """Initializing PasswordPool class"""
+        self.executor = None
+        self.pending = 0
+        register_gauge('passwords.pending', lambda: self.pending)
+
+    def get_executor(self):
+        """Get the executor of the pool, creating it once"""
+        if self.executor is None:
+            workers = int(os.getenv(
+                'PASSWORD_POOL_WORKERS', str(min(os.cpu_count() or 1, 4))))
+            if os.getenv('PASSWORD_POOL_KIND', 'thread') == 'process':
+                self.executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='argon2')
+        return self.executor
+
+    async def run(self, fxn, *args):
+        """Run a hashing function in the pool unless the queue is full"""
+        max_pending = int(os.getenv('PASSWORD_POOL_MAX_QUEUE', '64'))
+        if self.pending >= max_pending:
+            incr_counter('passwords.rejected')
+            raise PasswordPoolBusy('Password pool is saturated.')
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.get_executor(), fxn, *args)
+        finally:
+            self.pending -= 1
+
+    async def stop(self):
+        """Shut down the workers of the pool"""
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+
+
+password_pool = PasswordPool()
+"""Process-wide pool for password hashing"""
+
+
+async def hash_password(password: str):
+    """Hash a password in the password pool"""
+    return await password_pool.run(compute_hash, password)
+
+
+async def verify_password(hashed_password: str, password: str):
+    """Verify a password in the password pool"""
+    return await password_pool.run(
+        check_password, hashed_password, password)
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""Module for building post cards in batches of set-based queries"""
+from typing import List
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import Post, PostLike
+from .user_summaries import user_summaries
+
+
+def post_rows_query(post_ids: List[str]):
+    """Create query of the card columns of posts"""
+    return select(
+        Post.id,
+        Post.title,
+        Post.content,
+        Post.created_on,
+        Post.likes_count,
+        Post.comments_count,
+        Post.user_id
+    ).where(Post.id.in_(post_ids))
+
+
+def liked_ids_query(viewer_id: str, post_ids: List[str]):
+    """Create query of the posts among the given ones liked by a viewer"""
+    return select(PostLike.post_id).where(and_(
+        PostLike.user_id == viewer_id,
+        PostLike.post_id.in_(post_ids)
+    ))
+
+
+async def hydrate_posts(db_session: AsyncSession, post_ids: List[str],
+                        viewer_id=None):
+    """Create and return post cards in the order of the given post ids"""
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        return []
+    post_rows = (await db_session.execute(
+        post_rows_query(post_ids))).all()
+    authors = await user_summaries.get_many(
+        db_session, [row.user_id for row in post_rows])
+    liked_ids = set()
+    if viewer_id:
+        liked_ids = set((await db_session.scalars(
+            liked_ids_query(viewer_id, post_ids))).all())
+    posts_info = {}
+    for row in post_rows:
+        if row.user_id not in authors:
+            continue
+        posts_info[row.id] = {
+            'id': row.id,
+            'user': authors[row.user_id].to_dict(),
+            'title': row.title,
+            'publishedOn': row.created_on.isoformat(),
+            'stories': row.content,
+            'commentsCount': row.comments_count,
+            'likesCount': row.likes_count,
+            'isLiked': row.id in liked_ids
+        }
+    return [posts_info[id] for id in post_ids if id in posts_info]
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""Module for throttling failed sign ins with sliding-window counters"""
+import os
+import time
+from collections import OrderedDict
+
+from .metrics import incr_counter, register_gauge
+
+
+class SigninLimiter:
+    """Sliding-window counters of failed sign ins keyed by email or IP"""
+    def __init__(self):
+        """Initializing SigninLimiter class"""
+        self.entries = OrderedDict()
+        self.window = float(os.getenv('SIGNIN_WINDOW_SECONDS', '900'))
+        self.max_keys = int(os.getenv('SIGNIN_LIMITER_MAX_KEYS', '100000'))
+        register_gauge('signin_limiter.keys', lambda: len(self.entries))
+
+    @staticmethod
+    def email_key(email: str):
+        """Create the counter key of an email"""
+        return f'email:{email.strip().lower()}'
+
+    @staticmethod
+    def ip_key(client_ip: str):
+        """Create the counter key of a client IP"""
+        return f'ip:{client_ip}'
+
+    def estimate(self, key: str):
+        """Get the weighted count of failures in the last window"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return 0.0
+        window_idx, offset = divmod(time.monotonic(), self.window)
+        if entry[0] == window_idx:
+            previous, current = entry[2], entry[1]
+        elif entry[0] == window_idx - 1:
+            previous, current = entry[1], 0
+        else:
+            return 0.0
+        return previous * (1 - offset / self.window) + current
+
+    def is_limited(self, key: str, limit: int):
+        """Check if a key reached its failure limit"""
+        if self.estimate(key) >= limit:
+            incr_counter('signin_limiter.rejected')
+            return True
+        return False
+
+    def hit(self, key: str):
+        """Count a failure of a key and return its weighted count"""
+        window_idx = time.monotonic() // self.window
+        entry = self.entries.pop(key, None)
+        if entry is None or entry[0] < window_idx - 1:
+            entry = (window_idx, 1, 0)
+        elif entry[0] == window_idx - 1:
+            entry = (window_idx, 1, entry[1])
+        else:
+            entry = (window_idx, entry[1] + 1, entry[2])
+        self.entries[key] = entry
+        self.expire(window_idx)
+        return self.estimate(key)
+
+    def reset(self, key: str):
+        """Forget the failures of a key"""
+        self.entries.pop(key, None)
+
+    def expire(self, window_idx: float):
+        """Drop stale counters, least recently failed first"""
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            stale_entry = entry[0] < window_idx - 1
+            if not stale_entry and len(self.entries) <= self.max_keys:
+                break
+            del self.entries[key]
+
+
+signin_limiter = SigninLimiter()
+"""Process-wide limiter of failed sign ins"""
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""Module for statements computing people suggestions from follows"""
+import os
+from sqlalchemy import and_, select, delete, exists, func, literal, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from ..database import User, UserFollowing, UserSuggestion, SuggestionQueue
+
+
+def get_suggestions_limit():
+    """Get number of suggestions kept for each user"""
+    return int(os.getenv('SUGGESTIONS_TOP_K', '50'))
+
+
+def queue_stmt(users):
+    """Create statement queueing users selected by a query"""
+    stmt = insert(SuggestionQueue).from_select(
+        ['user_id', 'queued_on'], users)
+    return stmt.on_conflict_do_update(
+        index_elements=[SuggestionQueue.user_id],
+        set_={'queued_on': stmt.excluded.queued_on}
+    )
+
+
+def queue_follow_change_stmt(follower_id: str):
+    """Create statement queueing users whose friends-of-friends changed"""
+    users = union(
+        select(literal(follower_id).label('user_id')),
+        select(UserFollowing.follower_id).where(
+            UserFollowing.following_id == follower_id)
+    ).subquery()
+    return queue_stmt(select(users.c.user_id, func.now()))
+
+
+def queue_all_users_stmt():
+    """Create statement queueing every user"""
+    return queue_stmt(select(User.id, func.now()))
+
+
+def compute_suggestions_stmt(users_ids, top_k: int):
+    """Create statement storing top friends-of-friends of users"""
+    first_edge = aliased(UserFollowing)
+    second_edge = aliased(UserFollowing)
+    known_edge = aliased(UserFollowing)
+    candidates = select(
+        first_edge.follower_id.label('user_id'),
+        second_edge.following_id.label('suggested_id'),
+        func.count().label('mutual_count')
+    ).join(
+        second_edge, second_edge.follower_id == first_edge.following_id
+    ).where(and_(
+        first_edge.follower_id.in_(users_ids),
+        second_edge.following_id != first_edge.follower_id,
+        ~exists(select(known_edge.id).where(and_(
+            known_edge.follower_id == first_edge.follower_id,
+            known_edge.following_id == second_edge.following_id
+        )))
+    )).group_by(
+        first_edge.follower_id, second_edge.following_id
+    ).subquery()
+    ranked = select(
+        candidates.c.user_id,
+        candidates.c.suggested_id,
+        candidates.c.mutual_count,
+        func.row_number().over(
+            partition_by=candidates.c.user_id,
+            order_by=(
+                candidates.c.mutual_count.desc(),
+                candidates.c.suggested_id
+            )
+        ).label('position')
+    ).subquery()
+    top_candidates = select(
+        ranked.c.user_id,
+        ranked.c.suggested_id,
+        ranked.c.mutual_count,
+        func.now()
+    ).where(ranked.c.position <= top_k)
+    return insert(UserSuggestion).from_select(
+        ['user_id', 'suggested_id', 'mutual_count', 'created_on'],
+        top_candidates
+    )
+
+
+def clear_suggestions_stmt(users_ids):
+    """Create statement deleting stored suggestions of users"""
+    return delete(UserSuggestion).where(
+        UserSuggestion.user_id.in_(users_ids)
+    ).execution_options(synchronize_session=False)
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+"""Module for statements maintaining materialized home timelines"""
+import os
+from sqlalchemy import select, delete, func, literal, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import Post, Timeline, User, UserFollowing
+
+
+TIMELINE_COLUMNS = ['viewer_id', 'post_id', 'author_id', 'created_on']
+"""Columns written when posts are pushed into timelines"""
+
+
+def get_timeline_depth():
+    """Get number of posts kept in each home timeline"""
+    return int(os.getenv('FEED_TIMELINE_DEPTH', '800'))
+
+
+def push_post_stmt(author_id: str, post_id: str, created_on):
+    """Create statement pushing a post into timelines of followers"""
+    followers = select(
+        UserFollowing.follower_id,
+        literal(post_id),
+        literal(author_id),
+        literal(created_on)
+    ).where(UserFollowing.following_id == author_id)
+    return insert(Timeline).from_select(
+        TIMELINE_COLUMNS, followers
+    ).on_conflict_do_nothing().returning(Timeline.viewer_id)
+
+
+def push_author_stmt(viewer_id: str, author_id: str, depth: int):
+    """Create statement copying recent posts of an author to a timeline"""
+    author_posts = select(
+        literal(viewer_id),
+        Post.id,
+        Post.user_id,
+        Post.created_on
+    ).where(Post.user_id == author_id).order_by(
+        Post.created_on.desc(), Post.id.desc()
+    ).limit(depth)
+    return insert(Timeline).from_select(
+        TIMELINE_COLUMNS, author_posts
+    ).on_conflict_do_nothing()
+
+
+def push_author_followers_stmt(author_id: str, depth: int):
+    """Create statement copying recent posts of an author to followers"""
+    author_posts = select(Post.id, Post.user_id, Post.created_on).where(
+        Post.user_id == author_id
+    ).order_by(
+        Post.created_on.desc(), Post.id.desc()
+    ).limit(depth).subquery()
+    followers_posts = select(
+        UserFollowing.follower_id,
+        author_posts.c.id,
+        author_posts.c.user_id,
+        author_posts.c.created_on
+    ).join(
+        author_posts, UserFollowing.following_id == author_posts.c.user_id
+    )
+    return insert(Timeline).from_select(
+        TIMELINE_COLUMNS, followers_posts
+    ).on_conflict_do_nothing().returning(Timeline.viewer_id)
+
+
+def backfill_timelines_stmt(viewers_ids, depth: int):
+    """Create statement rebuilding timelines of viewers from follows"""
+    sources = union_all(
+        select(
+            UserFollowing.follower_id.label('viewer_id'),
+            UserFollowing.following_id.label('author_id')
+        ).where(UserFollowing.follower_id.in_(viewers_ids)),
+        select(
+            User.id.label('viewer_id'),
+            User.id.label('author_id')
+        ).where(User.id.in_(viewers_ids))
+    ).subquery()
+    ranked = select(
+        sources.c.viewer_id,
+        Post.id.label('post_id'),
+        Post.user_id.label('author_id'),
+        Post.created_on,
+        func.row_number().over(
+            partition_by=sources.c.viewer_id,
+            order_by=(Post.created_on.desc(), Post.id.desc())
+        ).label('position')
+    ).join(Post, Post.user_id == sources.c.author_id).subquery()
+    recent = select(
+        ranked.c.viewer_id,
+        ranked.c.post_id,
+        ranked.c.author_id,
+        ranked.c.created_on
+    ).where(ranked.c.position <= depth)
+    return insert(Timeline).from_select(
+        TIMELINE_COLUMNS, recent
+    ).on_conflict_do_nothing()
+
+
+def trim_timelines_stmt(viewers_ids, depth: int):
+    """Create statement deleting posts beyond the timeline depth"""
+    ranked = select(
+        Timeline.viewer_id,
+        Timeline.post_id,
+        func.row_number().over(
+            partition_by=Timeline.viewer_id,
+            order_by=(Timeline.created_on.desc(), Timeline.post_id.desc())
+        ).label('position')
+    ).where(Timeline.viewer_id.in_(viewers_ids)).subquery()
+    expired = select(ranked.c.viewer_id, ranked.c.post_id).where(
+        ranked.c.position > depth
+    )
+    return delete(Timeline).where(
+        Timeline.viewer_id.in_(viewers_ids),
+        tuple_(Timeline.viewer_id, Timeline.post_id).in_(expired)
+    ).execution_options(synchronize_session=False)
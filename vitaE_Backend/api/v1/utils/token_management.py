@@ -1,20 +1,152 @@
 #!/usr/bin/python3
 """Module for validating and handling authentication token"""
 import os
+import time
+import uuid
+import struct
+import hashlib
+from functools import lru_cache
+from collections import OrderedDict
 from json import JSONDecoder, JSONEncoder
 from datetime import datetime, timedelta
-from cryptography.fernet import Fernet
+from sqlalchemy import select
+from cryptography.fernet import Fernet, MultiFernet
 
-from ..database import get_session, User
+from ..database import User
+from .metrics import incr_counter, register_gauge
+
+
+TOKEN_V2_FORMAT = '>B16sII'
+"""Layout of v2 token payloads: format, user id, token version, expiry"""
+TOKEN_V2 = 2
+"""Format byte leading v2 token payloads"""
+
+
+@lru_cache(maxsize=4)
+def build_fernet(app_keys: str):
+    """Get the MultiFernet of comma separated keys, creating it once"""
+    return MultiFernet([
+        Fernet(bytes(app_key.strip(), 'utf-8'))
+        for app_key in app_keys.split(',') if app_key.strip()
+    ])
+
+
+def get_fernet():
+    """Get the MultiFernet of the app keys, the first one encrypts"""
+    app_keys = os.getenv('APP_SECRET_KEYS') or os.getenv('APP_SECRET_KEY')
+    return build_fernet(app_keys)
+
+
+def v1_tokens_accepted():
+    """Check if the migration window of v1 auth tokens is still open"""
+    v1_until = os.getenv('AUTH_TOKEN_V1_UNTIL', '')
+    if not v1_until:
+        return True
+    return datetime.utcnow() < datetime.fromisoformat(v1_until)
+
+
+class AuthTokenCache:
+    """LRU cache of validated auth tokens keyed by their digest"""
+    def __init__(self):
+        """Initializing AuthTokenCache class"""
+        self.entries = OrderedDict()
+        self.users_digests = {}
+        self.users_versions = OrderedDict()
+        self.max_tokens = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '100000'))
+        self.ttl = float(os.getenv('AUTH_TOKEN_CACHE_TTL', '60'))
+        register_gauge('auth_tokens.cached', lambda: len(self.entries))
+        register_gauge(
+            'auth_tokens.users_versions', lambda: len(self.users_versions))
+
+    @staticmethod
+    def digest(token: str):
+        """Create the cache key of a token string"""
+        return hashlib.blake2b(
+            bytes(token, 'utf-8'), digest_size=16).digest()
+
+    def get(self, digest: bytes):
+        """Get decoded fields of a cached token that is still valid"""
+        entry = self.entries.get(digest)
+        if entry is None or entry[0] <= time.monotonic():
+            incr_counter('auth_tokens.misses')
+            return None
+        if datetime.utcnow() >= entry[2]:
+            self.remove(digest)
+            incr_counter('auth_tokens.misses')
+            return None
+        self.entries.move_to_end(digest)
+        incr_counter('auth_tokens.hits')
+        return entry[1]
+
+    def put(self, digest: bytes, decoded_token: dict, expydt: datetime):
+        """Store decoded fields of a validated token"""
+        self.remove(digest)
+        self.entries[digest] = (
+            time.monotonic() + self.ttl, decoded_token, expydt)
+        self.users_digests.setdefault(
+            decoded_token['userId'], set()).add(digest)
+        while len(self.entries) > self.max_tokens:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, digest: bytes):
+        """Remove a cached token"""
+        entry = self.entries.pop(digest, None)
+        if entry is None:
+            return
+        user_digests = self.users_digests.get(entry[1]['userId'])
+        if user_digests is not None:
+            user_digests.discard(digest)
+            if not user_digests:
+                del self.users_digests[entry[1]['userId']]
+
+    def invalidate_user(self, user_id: str):
+        """Remove all cached tokens and the token version of a user"""
+        for digest in list(self.users_digests.get(user_id, ())):
+            self.remove(digest)
+        self.users_versions.pop(user_id, None)
+
+    def clear(self):
+        """Remove all cached tokens"""
+        self.entries.clear()
+        self.users_digests.clear()
+        self.users_versions.clear()
+
+    async def user_version(self, db_session, user_id: str):
+        """Get token version, email and active state of a user"""
+        entry = self.users_versions.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.users_versions.move_to_end(user_id)
+            incr_counter('auth_tokens.versions_hits')
+            return entry[1]
+        incr_counter('auth_tokens.versions_misses')
+        user_row = (await db_session.execute(
+            select(User.token_version, User.email, User.user_active).where(
+                User.id == user_id)
+        )).first()
+        if user_row is None:
+            return None
+        user_state = tuple(user_row)
+        self.users_versions[user_id] = (
+            time.monotonic() + self.ttl, user_state)
+        self.users_versions.move_to_end(user_id)
+        while len(self.users_versions) > self.max_tokens:
+            self.users_versions.popitem(last=False)
+        return user_state
+
+
+auth_token_cache = AuthTokenCache()
+"""Process-wide cache of validated auth tokens"""
 
 
 class AuthTokenMngr:
     """Authenticating token manager for getting and verifying token"""
-    def __init__(self, user_id='', email='', secure_text='', expires=None):
+    def __init__(self, user_id='', email='', secure_text='', expires=None,
+                 token_version=0):
         """Initializing AuthTokenMngr class"""
         self.user_id = user_id
         self.email = email
         self.secure_text = secure_text
+        self.token_version = token_version
         if expires:
             self.expires = expires
 
@@ -29,7 +161,7 @@ class AuthTokenMngr:
         if type(value) is str:
             self.__userId = value
         else:
-            raise TypeErroe('Invalid type.')
+            raise TypeError('Invalid type.')
 
     @property
     def email(self):
@@ -57,6 +189,19 @@ class AuthTokenMngr:
         else:
             raise TypeError('Invalid type.')
 
+    @property
+    def token_version(self):
+        """Create token version for AuthTokenMngr"""
+        return self.__tokenVersion
+
+    @token_version.setter
+    def token_version(self, value):
+        """Setting token version for AuthTokenMngr"""
+        if type(value) is int:
+            self.__tokenVersion = value
+        else:
+            raise TypeError('Invalid type.')
+
     @property
     def expires(self):
         """Create expiry date for AuthTokenMngr"""
@@ -74,90 +219,120 @@ class AuthTokenMngr:
         """Checking if the token generated has expired"""
         if not self.expires:
             return False
-        currnttime = datetime.utcnow()
-        expiry_conditions = [
-            currnttime.year <= self.expires.year,
-            currnttime.month <= self.expires.month,
-            currnttime.day <= self.expires.day,
-            currnttime.hour <= self.expires.hour,
-            currnttime.minute <= self.expires.minute,
-            currnttime.second <= self.expires.second
-        ]
-        return all(expiry_conditions)
+        return datetime.utcnow() >= self.expires
+
+    @staticmethod
+    def from_fields(decoded_token: dict):
+        """Create an AuthTokenMngr object from decoded token fields"""
+        auth_token = AuthTokenMngr(
+            user_id=decoded_token['userId'],
+            email=decoded_token['email'],
+            secure_text=decoded_token.get('secureText', ''),
+            expires=decoded_token['expires'],
+            token_version=decoded_token.get('tokenVersion', 0)
+        )
+        return auth_token
 
     @staticmethod
-    def convert_token(token: str):
+    async def convert_token(token: str, db_session):
         """Converting token string to an AuthTokenMngr object"""
-        app_key = bytes(os.getenv('APP_SECRET_KEY'), 'utf-8')
-        f = Fernet(app_key)
-        db_session = get_session()
         try:
-            decoded_token = JSONDecoder().decode(
-                f.decrypt(bytes(token, 'utf-8')).decode('utf-8')
-            )
-            valid_keys = {
-                'userId': str,
-                'email': str,
-                'secureText': str,
-                'expires': str
-            }
-            if type(decoded_token) is not dict:
-                raise TypeError('Decoded auth token should be a dictionary.')
-            for key, val in decoded_token.items():
-                if key in valid_keys:
-                    if type(val) is not valid_keys[key]:
-                        raise TypeError(
-                            f'Auth token Key "{key}" has invalid type.')
-                else:
-                    raise KeyError(
-                        f'Unexpected key "{key}" found in auth token.')
-            currntdt = datetime.utcnow()
-            expydt = datetime.fromisoformat(decoded_token['expires'])
-            if currntdt >= expydt:
-                raise ValueError('Auth token has expired.')
-            user = db_session.query(User).filter(
-                User.id == decoded_token['userId']
-            ).first()
-            valid_conds = (
-                user is not None,
-                user and user.user_active,
-                user and user.email == decoded_token['email'],
-                user and user.hashed_password == decoded_token['secureText']
+            digest = auth_token_cache.digest(token)
+            decoded_token = auth_token_cache.get(digest)
+            if decoded_token is not None:
+                return AuthTokenMngr.from_fields(decoded_token)
+            payload = get_fernet().decrypt(bytes(token, 'utf-8'))
+            if payload[:1] == bytes([TOKEN_V2]):
+                decoded_token = await AuthTokenMngr.convert_v2(
+                    payload, db_session)
+            else:
+                decoded_token = await AuthTokenMngr.convert_v1(
+                    payload, db_session)
+            auth_token_cache.put(
+                digest, decoded_token,
+                datetime.fromisoformat(decoded_token['expires'])
             )
-            if not all(valid_conds):
-                raise ValueError(
-                    'Auth token validation failed: data mismatch.')
-            db_session.close()
-            auth_token = AuthTokenMngr(
-                user_id=decoded_token['userId'],
-                email=decoded_token['email'],
-                secure_text=decoded_token['secureText'],
-                expires=decoded_token['expires']
-            )
-            return auth_token
+            return AuthTokenMngr.from_fields(decoded_token)
         except Exception as ex:
             print(ex)
-            db_session.close()
             return None
 
+    @staticmethod
+    async def convert_v2(payload: bytes, db_session):
+        """Validate a v2 token payload against the user token version"""
+        _, user_id, token_version, expiry = struct.unpack(
+            TOKEN_V2_FORMAT, payload)
+        expydt = datetime.utcfromtimestamp(expiry)
+        if datetime.utcnow() >= expydt:
+            raise ValueError('Auth token has expired.')
+        user_id = str(uuid.UUID(bytes=user_id))
+        user_state = await auth_token_cache.user_version(db_session, user_id)
+        if user_state is None or not user_state[2]:
+            raise ValueError('Auth token validation failed: data mismatch.')
+        if user_state[0] != token_version:
+            raise ValueError('Auth token validation failed: data mismatch.')
+        decoded_token = {
+            'userId': user_id,
+            'email': user_state[1],
+            'expires': expydt.isoformat(),
+            'tokenVersion': token_version
+        }
+        return decoded_token
+
+    @staticmethod
+    async def convert_v1(payload: bytes, db_session):
+        """Validate a v1 token payload against the user password hash"""
+        if not v1_tokens_accepted():
+            raise ValueError('Auth token format is no longer accepted.')
+        decoded_token = JSONDecoder().decode(payload.decode('utf-8'))
+        valid_keys = {
+            'userId': str,
+            'email': str,
+            'secureText': str,
+            'expires': str
+        }
+        if type(decoded_token) is not dict:
+            raise TypeError('Decoded auth token should be a dictionary.')
+        for key, val in decoded_token.items():
+            if key in valid_keys:
+                if type(val) is not valid_keys[key]:
+                    raise TypeError(
+                        f'Auth token Key "{key}" has invalid type.')
+            else:
+                raise KeyError(
+                    f'Unexpected key "{key}" found in auth token.')
+        currntdt = datetime.utcnow()
+        expydt = datetime.fromisoformat(decoded_token['expires'])
+        if currntdt >= expydt:
+            raise ValueError('Auth token has expired.')
+        user = await db_session.scalar(select(User).where(
+            User.id == decoded_token['userId']
+        ))
+        valid_conds = (
+            user is not None,
+            user and user.user_active,
+            user and user.email == decoded_token['email'],
+            user and user.hashed_password == decoded_token['secureText']
+        )
+        if not all(valid_conds):
+            raise ValueError(
+                'Auth token validation failed: data mismatch.')
+        decoded_token['tokenVersion'] = user.token_version
+        return decoded_token
+
     @staticmethod
     def encode_token(auth_token) -> str:
-        """Encode an AuthTokenMngr object to a token string"""
-        app_key = bytes(os.getenv('APP_SECRET_KEY'), 'utf-8')
-        f = Fernet(app_key)
+        """Encode an AuthTokenMngr object to a v2 token string"""
         try:
-            currntdt = datetime.utcnow()
-            timedurr = timedelta(days=30)
-            expydt = currntdt + timedurr
-            encoded_text = JSONEncoder().encode(
-                {
-                    'userId': auth_token.user_id,
-                    'email': auth_token.email,
-                    'secureText': auth_token.secure_text,
-                    'expires': expydt.isoformat()
-                }
+            expydt = datetime.utcnow() + timedelta(days=30)
+            payload = struct.pack(
+                TOKEN_V2_FORMAT,
+                TOKEN_V2,
+                uuid.UUID(auth_token.user_id).bytes,
+                auth_token.token_version,
+                int((expydt - datetime(1970, 1, 1)).total_seconds())
             )
-            return f.encrypt(bytes(encoded_text, 'utf-8')).decode('utf-8')
+            return get_fernet().encrypt(payload).decode('utf-8')
         except Exception:
             return ''
 
@@ -228,23 +403,12 @@ class ResetTokenMngr:
         """Checking if the token generated has expired"""
         if not self.expires:
             return False
-        currnttime = datetime.utcnow()
-        expiry_conditions = [
-            currnttime.year <= self.expires.year,
-            currnttime.month <= self.expires.month,
-            currnttime.day <= self.expires.day,
-            currnttime.hour <= self.expires.hour,
-            currnttime.minute <= self.expires.minute,
-            currnttime <= self.expires.second
-        ]
-        return all(expiry_conditions)
+        return datetime.utcnow() >= self.expires
 
     @staticmethod
-    def convert_token(token: str):
+    async def convert_token(token: str, db_session):
         """Converting reset token string to ResetTokenMngr object"""
-        app_key = bytes(os.getenv('APP_SECRET_KEY'), 'utf-8')
-        f = Fernet(app_key)
-        db_session = get_session()
+        f = get_fernet()
         try:
             decoded_token = JSONDecoder().decode(
                 f.decrypt(bytes(token, 'utf-8')).decode('utf-8')
@@ -269,9 +433,9 @@ class ResetTokenMngr:
             expydt = datetime.fromisoformat(decoded_token['expires'])
             if currntdt >= expydt:
                 raise ValueError('Token has expired.')
-            user = db_session.query(User).filter(
-                User.id == decoded_token['id']
-            ).first()
+            user = await db_session.scalar(select(User).where(
+                User.id == decoded_token['userId']
+            ))
             valid_conds = (
                 user is not None,
                 user and user.user_active,
@@ -280,7 +444,6 @@ class ResetTokenMngr:
             if not all(valid_conds):
                 raise ValueError(
                     'Reset token validation failed: data mismatch')
-            db_session.close()
             reset_token = ResetTokenMngr(
                 user_id=decoded_token['userId'],
                 email=decoded_token['email'],
@@ -289,24 +452,22 @@ class ResetTokenMngr:
             reset_token.expires = decoded_token['expires']
             return reset_token
         except Exception:
-            db_session.close()
             return None
 
     @staticmethod
     def encode_token(reset_token) -> str:
         """Encoding ResetTokenMngr object to a reset token string"""
-        app_key = bytes(os.getenv('APP_SECRET_KEY'), 'utf-8')
-        f = Fernet(app_key)
+        f = get_fernet()
         try:
             currntdt = datetime.utcnow()
             timedurr = timedelta(days=30)
             expydt = currntdt + timedurr
             encoded_txt = JSONEncoder().encode(
                 {
-                    'id': reset_token.user_id,
+                    'userId': reset_token.user_id,
                     'email': reset_token.email,
                     'message': reset_token.message,
-                    'expires': expdt.isoformat()
+                    'expires': expydt.isoformat()
                 }
             )
             return f.encrypt(bytes(encoded_txt, 'utf-8')).decode('utf-8')
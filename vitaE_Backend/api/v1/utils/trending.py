@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""Module for statements maintaining trending scores of posts"""
+import os
+from sqlalchemy import and_, or_, select, delete, exists, func, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import Post, PostScore, UserFollowing
+
+
+SCORE_COLUMNS = ['post_id', 'author_id', 'score', 'created_on', 'updated_on']
+"""Columns written when trending scores are refreshed"""
+
+
+def get_trending_window():
+    """Get age in hours after which posts stop being scored"""
+    return float(os.getenv('TRENDING_WINDOW_HOURS', '72'))
+
+
+def score_exp():
+    """Create time-decayed engagement score expression of posts"""
+    gravity = float(os.getenv('TRENDING_GRAVITY', '1.8'))
+    comment_weight = float(os.getenv('TRENDING_COMMENT_WEIGHT', '2'))
+    age_hours = func.extract(
+        'epoch', func.now() - Post.created_on) / literal(3600.0)
+    engagement = (
+        Post.likes_count + Post.comments_count * literal(comment_weight)
+        + literal(1.0)
+    )
+    return engagement / func.power(age_hours + literal(2.0), gravity)
+
+
+def window_start_exp():
+    """Create expression of the oldest creation time still scored"""
+    return func.now() - func.make_interval(
+        0, 0, 0, 0, 0, 0, get_trending_window() * 3600)
+
+
+def refresh_scores_stmt():
+    """Create statement upserting scores of posts within the window"""
+    recent_posts = select(
+        Post.id,
+        Post.user_id,
+        score_exp(),
+        Post.created_on,
+        func.now()
+    ).where(Post.created_on >= window_start_exp())
+    stmt = insert(PostScore).from_select(SCORE_COLUMNS, recent_posts)
+    return stmt.on_conflict_do_update(
+        index_elements=[PostScore.post_id],
+        set_={
+            'score': stmt.excluded.score,
+            'updated_on': stmt.excluded.updated_on
+        }
+    )
+
+
+def expire_scores_stmt():
+    """Create statement deleting scores of old or deleted posts"""
+    return delete(PostScore).where(or_(
+        PostScore.created_on < window_start_exp(),
+        ~exists(select(Post.id).where(Post.id == PostScore.post_id))
+    )).execution_options(synchronize_session=False)
+
+
+def unfollowed_condition(viewer_id: str):
+    """Create condition keeping scores of authors a viewer does not follow"""
+    followed = select(UserFollowing.id).where(and_(
+        UserFollowing.follower_id == viewer_id,
+        UserFollowing.following_id == PostScore.author_id
+    ))
+    return and_(PostScore.author_id != viewer_id, ~exists(followed))
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""Module for a per-process cache of user summaries shown on cards"""
+import os
+import time
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import User
+from .metrics import incr_counter, register_gauge
+
+
+def summaries_query(users_ids):
+    """Create query of the summary columns of users"""
+    return select(User.id, User.name, User.profile_picture_id).where(
+        User.id.in_(users_ids))
+
+
+class UserSummary:
+    """Compact record of the user fields shown in author blocks"""
+    __slots__ = ('id', 'name', 'profile_picture_id', 'expires_on')
+
+    def __init__(self, id, name, profile_picture_id, expires_on):
+        """Initializing UserSummary class"""
+        self.id = id
+        self.name = name
+        self.profile_picture_id = profile_picture_id
+        self.expires_on = expires_on
+
+    def to_dict(self):
+        """Create author block of the user"""
+        user_info = {
+            'id': self.id,
+            'name': self.name,
+            'profilePictureId': self.profile_picture_id
+        }
+        return user_info
+
+
+class UserSummaries:
+    """LRU cache of user summaries with a time to live"""
+    def __init__(self):
+        """Initializing UserSummaries class"""
+        self.entries = OrderedDict()
+        self.max_users = int(os.getenv('USER_SUMMARY_CACHE_SIZE', '50000'))
+        self.ttl = float(os.getenv('USER_SUMMARY_TTL', '300'))
+        register_gauge('user_summaries.size', lambda: len(self.entries))
+
+    def invalidate(self, user_id: str):
+        """Remove the cached summary of a user"""
+        self.entries.pop(user_id, None)
+
+    def clear(self):
+        """Remove all cached summaries"""
+        self.entries.clear()
+
+    async def get_many(self, db_session: AsyncSession, users_ids):
+        """Get summaries of users, loading misses with one query"""
+        currnttime = time.monotonic()
+        summaries = {}
+        misses_ids = []
+        for user_id in dict.fromkeys(users_ids):
+            summary = self.entries.get(user_id)
+            if summary is not None and summary.expires_on > currnttime:
+                self.entries.move_to_end(user_id)
+                summaries[user_id] = summary
+            else:
+                misses_ids.append(user_id)
+        incr_counter('user_summaries.hits', len(summaries))
+        incr_counter('user_summaries.misses', len(misses_ids))
+        if not misses_ids:
+            return summaries
+        users_rows = (await db_session.execute(
+            summaries_query(misses_ids))).all()
+        for row in users_rows:
+            summary = UserSummary(
+                row.id, row.name, row.profile_picture_id,
+                currnttime + self.ttl
+            )
+            self.entries[row.id] = summary
+            self.entries.move_to_end(row.id)
+            summaries[row.id] = summary
+        while len(self.entries) > self.max_users:
+            self.entries.popitem(last=False)
+        return summaries
+
+
+user_summaries = UserSummaries()
+"""Process-wide cache of user summaries"""
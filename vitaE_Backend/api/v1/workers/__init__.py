@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+"""Module for background workers running with the API server"""
+from fastapi import FastAPI
+
+from .fanout import timeline_fanout
+from .trending import trending_scores
+from .invalidation import invalidation_listener
+from .email_outbox import email_delivery
+from ..utils.passwords import password_pool
+
+
+def config_workers(app: FastAPI):
+    """Set up background workers to start and stop with the app"""
+    app.add_event_handler('startup', timeline_fanout.start)
+    app.add_event_handler('startup', trending_scores.start)
+    app.add_event_handler('startup', invalidation_listener.start)
+    app.add_event_handler('startup', email_delivery.start)
+    app.add_event_handler('shutdown', timeline_fanout.stop)
+    app.add_event_handler('shutdown', trending_scores.stop)
+    app.add_event_handler('shutdown', invalidation_listener.stop)
+    app.add_event_handler('shutdown', email_delivery.stop)
+    app.add_event_handler('shutdown', password_pool.stop)
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+"""Module for the background worker delivering queued emails"""
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, select, delete, func
+
+from ..database import get_async_session_factory, EmailOutbox
+from ..utils.metrics import incr_counter
+from ..utils.mailing import get_transport
+
+
+def get_retry_delay(attempts: int):
+    """Get the backoff before retrying an email after failed attempts"""
+    base_delay = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', '30'))
+    max_delay = float(os.getenv('EMAIL_RETRY_MAX_SECONDS', '3600'))
+    return timedelta(seconds=min(base_delay * 2 ** (attempts - 1), max_delay))
+
+
+class EmailDelivery:
+    """Email delivery worker draining the outbox in batches"""
+    def __init__(self):
+        """Initializing EmailDelivery class"""
+        self.task = None
+        self.wakeup = None
+
+    async def start(self):
+        """Start the delivery task"""
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run_deliveries())
+
+    async def stop(self):
+        """Stop the task of the worker"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    def wake(self):
+        """Start the next delivery without waiting for the poll interval"""
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run_deliveries(self):
+        """Deliver due emails, polling when the outbox is drained"""
+        poll_interval = float(os.getenv('EMAIL_OUTBOX_INTERVAL', '5'))
+        batch_size = int(os.getenv('EMAIL_OUTBOX_BATCH', '20'))
+        while True:
+            self.wakeup.clear()
+            try:
+                delivered = await self.deliver_batch(batch_size)
+            except Exception as ex:
+                print(f'Email delivery failed: {ex}')
+                incr_counter('email.batch_errors')
+                delivered = 0
+            if delivered == batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def deliver_batch(self, batch_size: int):
+        """Send a batch of due emails and record their outcome"""
+        max_attempts = int(os.getenv('EMAIL_MAX_ATTEMPTS', '8'))
+        retention = timedelta(
+            days=float(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', '7')))
+        transport = get_transport()
+        AsyncSessionLocal = get_async_session_factory()
+        async with AsyncSessionLocal() as db_session:
+            emails = (await db_session.scalars(
+                select(EmailOutbox).where(and_(
+                    EmailOutbox.status == 'pending',
+                    EmailOutbox.next_attempt_on <= func.now()
+                )).order_by(EmailOutbox.next_attempt_on).limit(
+                    batch_size).with_for_update(skip_locked=True)
+            )).all()
+            errors = []
+            if emails:
+                errors = await asyncio.to_thread(transport.send_many, [
+                    (email.recipient, email.subject, email.body_html)
+                    for email in emails
+                ])
+            for email, ex in zip(emails, errors):
+                if ex is None:
+                    email.status = 'sent'
+                    email.sent_on = datetime.now(timezone.utc)
+                    incr_counter('email.sent')
+                else:
+                    email.attempts += 1
+                    email.last_error = str(ex)[:1024]
+                    if email.attempts >= max_attempts:
+                        email.status = 'dead'
+                        incr_counter('email.dead_letters')
+                    else:
+                        email.next_attempt_on = (
+                            datetime.now(timezone.utc) +
+                            get_retry_delay(email.attempts)
+                        )
+                        incr_counter('email.retries')
+            await db_session.execute(delete(EmailOutbox).where(and_(
+                EmailOutbox.status == 'sent',
+                EmailOutbox.sent_on < func.now() - retention
+            )).execution_options(synchronize_session=False))
+            await db_session.commit()
+        return len(emails)
+
+
+email_delivery = EmailDelivery()
+"""Process-wide email delivery worker"""
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+"""Module for the background worker filling home timelines"""
+import os
+import asyncio
+from sqlalchemy import and_, or_, delete
+
+from ..database import get_async_session_factory, Timeline
+from ..utils.metrics import incr_counter, register_gauge
+from ..utils.hybrid_feed import pull_authors, recent_posts
+from ..utils.timelines import (
+    get_timeline_depth,
+    push_post_stmt,
+    push_author_stmt,
+    push_author_followers_stmt,
+    trim_timelines_stmt
+)
+
+
+def get_promote_depth():
+    """Get number of posts pushed when an author stops being pulled"""
+    return int(os.getenv('FEED_PROMOTE_DEPTH', '50'))
+
+
+class TimelineFanout:
+    """Timeline fan-out worker for pushing posts to followers"""
+    def __init__(self):
+        """Initializing TimelineFanout class"""
+        self.queue = None
+        self.tasks = []
+        self.dirty_viewers = set()
+        register_gauge(
+            'feed.fanout_queue_depth',
+            lambda: self.queue.qsize() if self.queue else 0
+        )
+
+    def enqueue(self, job_kind: str, **job):
+        """Add a fan-out job to the queue of the worker"""
+        if self.queue is None:
+            incr_counter('feed.fanout_dropped')
+            return False
+        try:
+            self.queue.put_nowait((job_kind, job))
+            return True
+        except asyncio.QueueFull:
+            incr_counter('feed.fanout_dropped')
+            return False
+
+    async def start(self):
+        """Start the fan-out, timeline trimming and pull refresh tasks"""
+        queue_size = int(os.getenv('FEED_FANOUT_QUEUE_SIZE', '10000'))
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks = [
+            asyncio.create_task(self.run_jobs()),
+            asyncio.create_task(self.run_trims()),
+            asyncio.create_task(self.run_pull_refresh())
+        ]
+
+    async def stop(self):
+        """Stop the tasks of the worker"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def run_jobs(self):
+        """Process fan-out jobs as they are queued"""
+        while True:
+            job_kind, job = await self.queue.get()
+            try:
+                await self.process_job(job_kind, job)
+                incr_counter(f'feed.fanout_{job_kind}_jobs')
+            except Exception as ex:
+                print(f'Fan-out job {job_kind} failed: {ex}')
+                incr_counter('feed.fanout_errors')
+            finally:
+                self.queue.task_done()
+
+    async def process_job(self, job_kind: str, job: dict):
+        """Apply a single fan-out job to the timelines table"""
+        depth = get_timeline_depth()
+        AsyncSessionLocal = get_async_session_factory()
+        async with AsyncSessionLocal() as db_session:
+            if job_kind == 'post' and job['author_id'] in pull_authors:
+                recent_posts.invalidate(job['author_id'])
+                incr_counter('feed.pull_posts')
+            elif job_kind == 'post':
+                pushed = await db_session.execute(push_post_stmt(
+                    job['author_id'], job['post_id'], job['created_on']))
+                viewers_ids = pushed.scalars().all()
+                self.dirty_viewers.update(viewers_ids)
+                incr_counter('feed.push_posts')
+                incr_counter('feed.push_rows', len(viewers_ids))
+            elif job_kind == 'push_author':
+                pushed = await db_session.execute(push_author_followers_stmt(
+                    job['author_id'], get_promote_depth()))
+                viewers_ids = set(pushed.scalars().all())
+                self.dirty_viewers.update(viewers_ids)
+                incr_counter('feed.push_rows', len(viewers_ids))
+            elif job_kind == 'follow' and job['author_id'] in pull_authors:
+                incr_counter('feed.pull_follows')
+            elif job_kind == 'follow':
+                await db_session.execute(push_author_stmt(
+                    job['viewer_id'], job['author_id'], depth))
+                self.dirty_viewers.add(job['viewer_id'])
+            elif job_kind == 'unfollow':
+                await db_session.execute(delete(Timeline).where(and_(
+                    Timeline.viewer_id == job['viewer_id'],
+                    Timeline.author_id == job['author_id']
+                )))
+            elif job_kind == 'delete_post':
+                recent_posts.invalidate(job['author_id'])
+                await db_session.execute(delete(Timeline).where(
+                    Timeline.post_id == job['post_id']))
+            elif job_kind == 'remove_user':
+                recent_posts.invalidate(job['user_id'])
+                await db_session.execute(delete(Timeline).where(or_(
+                    Timeline.viewer_id == job['user_id'],
+                    Timeline.author_id == job['user_id']
+                )))
+            await db_session.commit()
+
+    async def run_pull_refresh(self):
+        """Periodically reload authors merged into feeds at read time"""
+        refresh_interval = float(
+            os.getenv('FEED_PULL_REFRESH_INTERVAL', '300'))
+        AsyncSessionLocal = get_async_session_factory()
+        while True:
+            try:
+                async with AsyncSessionLocal() as db_session:
+                    left_ids = await pull_authors.refresh(db_session)
+                for author_id in left_ids:
+                    recent_posts.invalidate(author_id)
+                    self.enqueue('push_author', author_id=author_id)
+            except Exception as ex:
+                print(f'Pull authors refresh failed: {ex}')
+                incr_counter('feed.pull_refresh_errors')
+            await asyncio.sleep(refresh_interval)
+
+    async def run_trims(self):
+        """Periodically trim timelines that received new posts"""
+        trim_interval = float(os.getenv('FEED_TRIM_INTERVAL', '60'))
+        batch_size = 500
+        while True:
+            await asyncio.sleep(trim_interval)
+            viewers_ids = list(self.dirty_viewers)
+            self.dirty_viewers.clear()
+            for indx in range(0, len(viewers_ids), batch_size):
+                try:
+                    await self.trim(viewers_ids[indx:indx + batch_size])
+                except Exception as ex:
+                    print(f'Timeline trim failed: {ex}')
+                    incr_counter('feed.trim_errors')
+
+    async def trim(self, viewers_ids):
+        """Delete posts beyond the timeline depth of the given viewers"""
+        AsyncSessionLocal = get_async_session_factory()
+        async with AsyncSessionLocal() as db_session:
+            trimmed = await db_session.execute(
+                trim_timelines_stmt(viewers_ids, get_timeline_depth()))
+            await db_session.commit()
+            incr_counter('feed.trimmed_rows', trimmed.rowcount)
+
+
+timeline_fanout = TimelineFanout()
+"""Process-wide timeline fan-out worker"""
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""Module for the background listener evicting stale cache entries"""
+import os
+import asyncio
+import asyncpg
+
+from ..database import get_async_url
+from ..utils.metrics import incr_counter
+from ..utils.invalidation import INVALIDATION_CHANNEL, decode_event
+from ..utils.follow_graph import follow_graph
+from ..utils.hybrid_feed import recent_posts
+from ..utils.user_summaries import user_summaries
+from ..utils.token_management import auth_token_cache
+
+
+class InvalidationListener:
+    """Listener applying invalidation events of all workers to caches"""
+    def __init__(self):
+        """Initializing InvalidationListener class"""
+        self.handlers = {}
+        self.clearers = []
+        self.pending = set()
+        self.pending_event = None
+        self.tasks = []
+
+    def register(self, kind: str, invalidate_fxn, clear_fxn):
+        """Add a cache evicted by events of a kind"""
+        self.handlers.setdefault(kind, []).append(invalidate_fxn)
+        self.clearers.append(clear_fxn)
+
+    async def start(self):
+        """Start the listening and event applying tasks"""
+        self.pending_event = asyncio.Event()
+        self.tasks = [
+            asyncio.create_task(self.run_listener()),
+            asyncio.create_task(self.run_evictions())
+        ]
+
+    async def stop(self):
+        """Stop the tasks of the listener"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def receive(self, connection, pid, channel, payload):
+        """Collect a notification until the next eviction pass"""
+        incr_counter('invalidation.received')
+        try:
+            kind, keys = decode_event(payload)
+        except Exception:
+            incr_counter('invalidation.invalid')
+            return
+        for key in keys:
+            self.pending.add((kind, key))
+        self.pending_event.set()
+
+    async def run_listener(self):
+        """Keep a connection listening on the channel, reconnecting"""
+        dsn = get_async_url().set(drivername='postgresql').render_as_string(
+            hide_password=False)
+        retry_delay = 1
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(
+                    INVALIDATION_CHANNEL, self.receive)
+                self.clear_all()
+                retry_delay = 1
+                while not connection.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                print(f'Invalidation listener failed: {ex}')
+                incr_counter('invalidation.reconnects')
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            self.clear_all()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+
+    async def run_evictions(self):
+        """Apply collected events in coalesced batches"""
+        coalesce_delay = float(
+            os.getenv('INVALIDATION_COALESCE_MS', '50')) / 1000
+        while True:
+            await self.pending_event.wait()
+            await asyncio.sleep(coalesce_delay)
+            self.pending_event.clear()
+            events = self.pending
+            self.pending = set()
+            for kind, key in events:
+                for invalidate_fxn in self.handlers.get(kind, []):
+                    invalidate_fxn(key)
+            incr_counter('invalidation.applied', len(events))
+
+    def clear_all(self):
+        """Empty every cache after events may have been missed"""
+        for clear_fxn in self.clearers:
+            clear_fxn()
+        incr_counter('invalidation.clears')
+
+
+invalidation_listener = InvalidationListener()
+"""Process-wide invalidation listener"""
+
+invalidation_listener.register(
+    'user', user_summaries.invalidate, user_summaries.clear)
+invalidation_listener.register(
+    'follow', lambda x: follow_graph.invalidate(*x.split(' ')),
+    follow_graph.clear)
+invalidation_listener.register(
+    'auth_user', auth_token_cache.invalidate_user, auth_token_cache.clear)
+invalidation_listener.register(
+    'author_posts', recent_posts.invalidate, recent_posts.clear)
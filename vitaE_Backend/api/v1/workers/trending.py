@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""Module for the background worker refreshing trending scores"""
+import os
+import asyncio
+
+from ..database import get_async_session_factory
+from ..utils.metrics import incr_counter
+from ..utils.trending import refresh_scores_stmt, expire_scores_stmt
+
+
+class TrendingScores:
+    """Trending scores worker for ranking explore candidates"""
+    def __init__(self):
+        """Initializing TrendingScores class"""
+        self.task = None
+
+    async def start(self):
+        """Start the score refreshing task"""
+        self.task = asyncio.create_task(self.run_refreshes())
+
+    async def stop(self):
+        """Stop the task of the worker"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def run_refreshes(self):
+        """Periodically recompute scores of recent posts"""
+        refresh_interval = float(
+            os.getenv('TRENDING_REFRESH_INTERVAL', '300'))
+        while True:
+            try:
+                await self.refresh()
+            except Exception as ex:
+                print(f'Trending scores refresh failed: {ex}')
+                incr_counter('explore.score_errors')
+            await asyncio.sleep(refresh_interval)
+
+    async def refresh(self):
+        """Upsert scores of posts in the window and drop expired ones"""
+        AsyncSessionLocal = get_async_session_factory()
+        async with AsyncSessionLocal() as db_session:
+            refreshed = await db_session.execute(refresh_scores_stmt())
+            expired = await db_session.execute(expire_scores_stmt())
+            await db_session.commit()
+        incr_counter('explore.scored_posts', refreshed.rowcount)
+        incr_counter('explore.expired_scores', expired.rowcount)
+
+
+trending_scores = TrendingScores()
+"""Process-wide trending scores worker"""
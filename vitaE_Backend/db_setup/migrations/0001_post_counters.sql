@@ -0,0 +1,10 @@
+-- Add denormalized like, comment and reply counters
+
+ALTER TABLE posts
+	ADD COLUMN IF NOT EXISTS likes_count INTEGER NOT NULL DEFAULT 0,
+	ADD COLUMN IF NOT EXISTS comments_count INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE comments
+	ADD COLUMN IF NOT EXISTS replies_count INTEGER NOT NULL DEFAULT 0;
+
+-- Fill the new counters with: python3 -m jobs.reconcile_counters
@@ -0,0 +1,27 @@
+-- Composite indexes for foreign-key access paths and keyset pages
+-- Run outside of a transaction block, CONCURRENTLY avoids write locks
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_posts_title;
+DROP INDEX CONCURRENTLY IF EXISTS ix_posts_content;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_user_created
+	ON posts (user_id, created_on, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_created
+	ON posts (created_on);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_likes_user_created
+	ON posts_likes (user_id, created_on, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_post_parent_created
+	ON comments (post_id, comment_id, created_on, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_parent_created
+	ON comments (comment_id, created_on, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_user_created
+	ON comments (user_id, created_on, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_followings_follower_created
+	ON users_followings (follower_id, created_on, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_followings_following_created
+	ON users_followings (following_id, created_on, id);
+
+-- Check the plans with: TEST_DATABASE_URL=... python3 -m pytest tests
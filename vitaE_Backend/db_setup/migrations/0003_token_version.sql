@@ -0,0 +1,7 @@
+-- Add the counter checked by v2 auth tokens instead of the password hash
+
+ALTER TABLE users
+	ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+-- Tokens issued before this column existed stay valid until
+-- AUTH_TOKEN_V1_UNTIL, they are re-issued as v2 on the next sign in
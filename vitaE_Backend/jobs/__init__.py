@@ -0,0 +1,2 @@
+#!/usr/bin/python3
+"""Package for batch jobs run outside of the API server"""
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+"""Module for rebuilding home timelines from follows and posts"""
+import sys
+from sqlalchemy import select
+
+from api.v1.database import get_session, User
+from api.v1.utils.timelines import (
+    get_timeline_depth,
+    backfill_timelines_stmt,
+    trim_timelines_stmt
+)
+
+
+def backfill_timelines(batch_size=200):
+    """Fill timelines of all users in batches ordered by user id"""
+    depth = get_timeline_depth()
+    db_session = get_session()
+    try:
+        last_id = ''
+        users_count = 0
+        while True:
+            users_ids = db_session.scalars(
+                select(User.id).where(User.id > last_id).order_by(
+                    User.id
+                ).limit(batch_size)
+            ).all()
+            if not users_ids:
+                break
+            db_session.execute(backfill_timelines_stmt(users_ids, depth))
+            db_session.execute(trim_timelines_stmt(users_ids, depth))
+            db_session.commit()
+            users_count += len(users_ids)
+            last_id = users_ids[-1]
+        print(f'Backfilled timelines of {users_count} users')
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    backfill_timelines(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
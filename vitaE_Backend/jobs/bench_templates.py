@@ -0,0 +1,29 @@
+#!/usr/bin/python3
+"""Module for timing email template rendering"""
+import sys
+import time
+
+from api.v1.utils.html_template_processor import (
+    get_environment,
+    html_template_render,
+    preload_templates
+)
+
+
+def bench_templates(renders: int):
+    """Time the preload and the average render of each template"""
+    started = time.perf_counter()
+    preload_templates()
+    print(f'preload: {(time.perf_counter() - started) * 1000:.2f} ms')
+    for template_name in get_environment().list_templates(
+            extensions=['html']):
+        template_name = template_name[:-len('.html')]
+        started = time.perf_counter()
+        for _ in range(renders):
+            html_template_render(template_name, name='Ada', token='x' * 120)
+        elapsed = time.perf_counter() - started
+        print(f'{template_name}: {elapsed / renders * 1e6:.1f} us/render')
+
+
+if __name__ == '__main__':
+    bench_templates(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
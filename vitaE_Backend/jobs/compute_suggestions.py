@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""Module for computing people suggestions of queued users"""
+import sys
+from sqlalchemy import select, delete, tuple_
+
+from api.v1.database import get_session, SuggestionQueue
+from api.v1.utils.suggestions import (
+    get_suggestions_limit,
+    queue_all_users_stmt,
+    compute_suggestions_stmt,
+    clear_suggestions_stmt
+)
+
+
+def compute_suggestions(batch_size=200, full=False):
+    """Recompute suggestions of users queued since the last run"""
+    top_k = get_suggestions_limit()
+    db_session = get_session()
+    try:
+        if full:
+            db_session.execute(queue_all_users_stmt())
+            db_session.commit()
+        users_count = 0
+        while True:
+            queued_rows = db_session.execute(
+                select(
+                    SuggestionQueue.user_id, SuggestionQueue.queued_on
+                ).order_by(SuggestionQueue.queued_on).limit(batch_size)
+            ).all()
+            if not queued_rows:
+                break
+            users_ids = [row.user_id for row in queued_rows]
+            db_session.execute(clear_suggestions_stmt(users_ids))
+            db_session.execute(compute_suggestions_stmt(users_ids, top_k))
+            db_session.execute(delete(SuggestionQueue).where(
+                tuple_(
+                    SuggestionQueue.user_id, SuggestionQueue.queued_on
+                ).in_([tuple(row) for row in queued_rows])
+            ).execution_options(synchronize_session=False))
+            db_session.commit()
+            users_count += len(users_ids)
+        print(f'Computed suggestions of {users_count} users')
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    batch_args = [x for x in sys.argv[1:] if x != '--full']
+    compute_suggestions(
+        int(batch_args[0]) if batch_args else 200,
+        '--full' in sys.argv
+    )
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""Module for bulk reconciliation of denormalized counters"""
+import sys
+from sqlalchemy import select
+
+from api.v1.database import get_session, Comment, Post, User
+from api.v1.utils.counters import (
+    recount_posts_stmt,
+    recount_comments_stmt,
+    recount_user_stats_stmt
+)
+
+
+def reconcile_table(db_session, id_column, recount_stmt_fxn, batch_size):
+    """Recompute counters of a table in batches ordered by id"""
+    last_id = ''
+    rows_count = 0
+    while True:
+        rows_ids = db_session.scalars(
+            select(id_column).where(id_column > last_id).order_by(
+                id_column
+            ).limit(batch_size)
+        ).all()
+        if not rows_ids:
+            break
+        db_session.execute(recount_stmt_fxn(rows_ids))
+        db_session.commit()
+        rows_count += len(rows_ids)
+        last_id = rows_ids[-1]
+    return rows_count
+
+
+def reconcile_counters(batch_size=1000):
+    """Recompute post, comment and profile counters from source rows"""
+    db_session = get_session()
+    try:
+        posts_count = reconcile_table(
+            db_session, Post.id, recount_posts_stmt, batch_size)
+        comments_count = reconcile_table(
+            db_session, Comment.id, recount_comments_stmt, batch_size)
+        users_count = reconcile_table(
+            db_session, User.id, recount_user_stats_stmt, batch_size)
+        print(f'Reconciled {posts_count} posts, {comments_count} comments '
+              f'and {users_count} users')
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    reconcile_counters(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
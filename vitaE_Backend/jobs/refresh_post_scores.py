@@ -0,0 +1,24 @@
+#!/usr/bin/python3
+"""Module for recomputing trending scores of recent posts"""
+from api.v1.database import get_session
+from api.v1.utils.trending import refresh_scores_stmt, expire_scores_stmt
+
+
+def refresh_post_scores():
+    """Upsert scores of posts in the window and drop expired ones"""
+    db_session = get_session()
+    try:
+        refreshed = db_session.execute(refresh_scores_stmt())
+        expired = db_session.execute(expire_scores_stmt())
+        db_session.commit()
+        print(f'Scored {refreshed.rowcount} posts, '
+              f'expired {expired.rowcount} scores')
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    refresh_post_scores()
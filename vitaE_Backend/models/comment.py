@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 """Module for comment model schema representing the database"""
-from sqlalchemy import Column, ForeignKey, TIMESTAMP, String
+from sqlalchemy import Column, ForeignKey, TIMESTAMP, String, Integer, Index
 from datetime import datetime
 
 from . import Base
@@ -9,6 +9,13 @@ from . import Base
 class Comment(Base):
     """Comment model class for posts or replys of comment"""
     __tablename__ = 'comments'
+    __table_args__ = (
+        Index('idx_comments_post_parent_created',
+              'post_id', 'comment_id', 'created_on', 'id'),
+        Index('idx_comments_parent_created',
+              'comment_id', 'created_on', 'id'),
+        Index('idx_comments_user_created', 'user_id', 'created_on', 'id')
+    )
     id = Column(String(64), unique=True, nullable=False, primary_key=True)
     created_on = Column(TIMESTAMP(True), nullable=False,
                         default=datetime.utcnow())
@@ -16,3 +23,4 @@ class Comment(Base):
     user_id = Column(String(64), ForeignKey('users.id'), nullable=False)
     comment_id = Column(String(64), nullable=True)
     content = Column(String(384), nullable=False)
+    replies_count = Column(Integer, nullable=False, default=0)
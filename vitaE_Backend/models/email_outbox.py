@@ -0,0 +1,24 @@
+#!/usr/bin/python3
+"""Module for EmailOutbox model schema representing the database"""
+from sqlalchemy import (
+    Column, String, TEXT, Integer, BigInteger, TIMESTAMP, Index)
+
+from . import Base
+
+
+class EmailOutbox(Base):
+    """EmailOutbox model class for emails waiting to be delivered"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('idx_email_outbox_due', 'status', 'next_attempt_on'),
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    recipient = Column(String(320), nullable=False)
+    subject = Column(String(256), nullable=False)
+    body_html = Column(TEXT, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(TEXT, nullable=False, default='')
+    created_on = Column(TIMESTAMP(True), nullable=False)
+    next_attempt_on = Column(TIMESTAMP(True), nullable=False)
+    sent_on = Column(TIMESTAMP(True), nullable=True)
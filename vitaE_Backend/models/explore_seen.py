@@ -0,0 +1,15 @@
+#!/usr/bin/python3
+"""Module for ExploreSeen model schema representing the database"""
+from sqlalchemy import Column, String, Integer, LargeBinary, TIMESTAMP
+
+from . import Base
+
+
+class ExploreSeen(Base):
+    """ExploreSeen model class for Bloom filters of served explore posts"""
+    __tablename__ = 'explore_seen'
+    user_id = Column(String(64), nullable=False, primary_key=True)
+    current_bits = Column(LargeBinary, nullable=False)
+    previous_bits = Column(LargeBinary, nullable=True)
+    current_count = Column(Integer, nullable=False, default=0)
+    updated_on = Column(TIMESTAMP(True), nullable=False)
@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 """Module for Post Model representing the database"""
-from sqlalchemy import Column, String, ForeignKey, TEXT, Index
+from sqlalchemy import Column, String, ForeignKey, TEXT, Index, Integer
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import cast, func
@@ -12,8 +12,10 @@ class Post(BaseModel, Base):
     """Post model for database representation"""
     __tablename__ = 'posts'
     user_id = Column(String(64), ForeignKey('users.id'), nullable=False)
-    title = Column(String(256), nullable=False, default='', index=True)
-    content = Column(TEXT, nullable=False, index=True)
+    title = Column(String(256), nullable=False, default='')
+    content = Column(TEXT, nullable=False)
+    likes_count = Column(Integer, nullable=False, default=0)
+    comments_count = Column(Integer, nullable=False, default=0)
     comments = relationship('Comment', cascade='all, delete, delete-orphan',
                             backref='post')
     likes = relationship('PostLike', cascade='all, delete, delete-orphan',
@@ -24,5 +26,7 @@ class Post(BaseModel, Base):
         cast(func.coalesce(title, ''), postgresql.TEXT))
     __table_args__ = (
         Index('indx_vts_post_text', __content_ts__, postgresql_using='gin'),
-        Index('indx_vts_post_title', __title_ts__, postgresql_using='gin')
+        Index('indx_vts_post_title', __title_ts__, postgresql_using='gin'),
+        Index('idx_posts_user_created', 'user_id', 'created_on', 'id'),
+        Index('idx_posts_created', 'created_on')
     )
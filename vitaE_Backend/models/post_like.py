@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Module for PostLike model schema representing the database"""
-from sqlalchemy import UniqueConstraint, Column, String, TIMESTAMP, ForeignKey
+from sqlalchemy import (
+    UniqueConstraint, Column, String, TIMESTAMP, ForeignKey, Index)
 from datetime import datetime
 
 from . import Base, BaseModel
@@ -15,6 +16,7 @@ class PostLike(BaseModel, Base):
             'user_id',
             name='unique_reaction'
         ),
+        Index('idx_posts_likes_user_created', 'user_id', 'created_on', 'id')
     )
     id = Column(String(64), unique=True, nullable=False, primary_key=True)
     created_on = Column(TIMESTAMP(True), nullable=False,
@@ -0,0 +1,19 @@
+#!/usr/bin/python3
+"""Module for PostScore model schema representing the database"""
+from sqlalchemy import Column, String, Float, TIMESTAMP, Index
+
+from . import Base
+
+
+class PostScore(Base):
+    """PostScore model class for trending scores of recent posts"""
+    __tablename__ = 'post_scores'
+    __table_args__ = (
+        Index('idx_post_scores_rank', 'score', 'post_id'),
+        Index('idx_post_scores_author', 'author_id')
+    )
+    post_id = Column(String(64), nullable=False, primary_key=True)
+    author_id = Column(String(64), nullable=False)
+    score = Column(Float, nullable=False, default=0)
+    created_on = Column(TIMESTAMP(True), nullable=False)
+    updated_on = Column(TIMESTAMP(True), nullable=False)
@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+"""Module for Timeline model schema representing the database"""
+from sqlalchemy import Column, String, TIMESTAMP, Index
+
+from . import Base
+
+
+class Timeline(Base):
+    """Timeline model class for posts materialized into home feeds"""
+    __tablename__ = 'timelines'
+    __table_args__ = (
+        Index('idx_timelines_viewer_created',
+              'viewer_id', 'created_on', 'post_id'),
+        Index('idx_timelines_post', 'post_id'),
+        Index('idx_timelines_author', 'author_id')
+    )
+    viewer_id = Column(String(64), nullable=False, primary_key=True)
+    post_id = Column(String(64), nullable=False, primary_key=True)
+    author_id = Column(String(64), nullable=False)
+    created_on = Column(TIMESTAMP(True), nullable=False)
@@ -17,6 +17,7 @@ class User(BaseModel, Base):
     profile_picture_id = Column(TEXT, nullable=False, default='')
     hashed_password = Column(TEXT, nullable=False)
     signin_attempts = Column(Integer, nullable=False, default=0)
+    token_version = Column(Integer, nullable=False, default=0)
     user_active = Column(Boolean, default=True)
     user_reset_token = Column(TEXT, nullable=True, default='')
     posts = relationship('Post', cascade='all, delete, delete-orphan',
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Module for UserFollowing model schema representing the database"""
-from sqlalchemy import UniqueConstraint, Column, String, TIMESTAMP, ForeignKey
+from sqlalchemy import (
+    UniqueConstraint, Column, String, TIMESTAMP, ForeignKey, Index)
 from datetime import datetime
 
 from . import Base, BaseModel
@@ -15,6 +16,10 @@ class UserFollowing(Base):
             'following_id',
             name='unique_connection'
         ),
+        Index('idx_users_followings_follower_created',
+              'follower_id', 'created_on', 'id'),
+        Index('idx_users_followings_following_created',
+              'following_id', 'created_on', 'id')
     )
     id = Column(String(64), unique=True, nullable=False, primary_key=True)
     created_on = Column(TIMESTAMP(True), nullable=False,
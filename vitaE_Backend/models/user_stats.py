@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+"""Module for UserStats model schema representing the database"""
+from sqlalchemy import Column, String, Integer, TIMESTAMP, Index
+
+from . import Base
+
+
+class UserStats(Base):
+    """UserStats model class for denormalized profile counters"""
+    __tablename__ = 'user_stats'
+    __table_args__ = (
+        Index('idx_user_stats_followers', 'followers_count'),
+    )
+    user_id = Column(String(64), nullable=False, primary_key=True)
+    followers_count = Column(Integer, nullable=False, default=0)
+    followings_count = Column(Integer, nullable=False, default=0)
+    posts_count = Column(Integer, nullable=False, default=0)
+    likes_count = Column(Integer, nullable=False, default=0)
+    comments_count = Column(Integer, nullable=False, default=0)
+    updated_on = Column(TIMESTAMP(True), nullable=False)
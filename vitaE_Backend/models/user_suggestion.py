@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+"""Module for UserSuggestion model schema representing the database"""
+from sqlalchemy import Column, String, Integer, TIMESTAMP, Index
+
+from . import Base
+
+
+class UserSuggestion(Base):
+    """UserSuggestion model class for precomputed accounts to follow"""
+    __tablename__ = 'user_suggestions'
+    __table_args__ = (
+        Index('idx_user_suggestions_rank',
+              'user_id', 'mutual_count', 'suggested_id'),
+    )
+    user_id = Column(String(64), nullable=False, primary_key=True)
+    suggested_id = Column(String(64), nullable=False, primary_key=True)
+    mutual_count = Column(Integer, nullable=False, default=0)
+    created_on = Column(TIMESTAMP(True), nullable=False)
+
+
+class SuggestionQueue(Base):
+    """SuggestionQueue model class for users with stale suggestions"""
+    __tablename__ = 'suggestion_queue'
+    __table_args__ = (
+        Index('idx_suggestion_queue_queued', 'queued_on'),
+    )
+    user_id = Column(String(64), nullable=False, primary_key=True)
+    queued_on = Column(TIMESTAMP(True), nullable=False)
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Module for fixtures shared by the database tests"""
+import os
+import uuid
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from api.v1.database import Base
+
+
+@pytest.fixture
+def schema_sessions():
+    """Create tables in a throwaway schema and yield an async sessionmaker"""
+    db_url = os.getenv('TEST_DATABASE_URL')
+    if not db_url:
+        pytest.skip('TEST_DATABASE_URL is not set.')
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    admin_engine = create_engine(db_url)
+    with admin_engine.begin() as conn:
+        conn.exec_driver_sql(f'CREATE SCHEMA {schema}')
+    engine = create_engine(
+        db_url, connect_args={'options': f'-csearch_path={schema}'})
+    async_engine = create_async_engine(
+        make_url(db_url).set(drivername='postgresql+asyncpg'),
+        poolclass=NullPool,
+        connect_args={'server_settings': {'search_path': schema}}
+    )
+    try:
+        Base.metadata.create_all(engine)
+        yield async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    finally:
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+        with admin_engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP SCHEMA {schema} CASCADE')
+        admin_engine.dispose()
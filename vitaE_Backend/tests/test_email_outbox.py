@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""Module for checking delivery of queued emails"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, func
+
+from api.v1.database import EmailOutbox
+from api.v1.utils.mailing import (
+    EmailTransport, GmailTransport, get_transport, queue_message)
+from api.v1.workers import email_outbox
+from api.v1.workers.email_outbox import email_delivery
+
+
+class UnavailableGmail(GmailTransport):
+    """Gmail transport whose client cannot be built"""
+    def get_service(self):
+        """Fail like missing or revoked credentials"""
+        raise RuntimeError('Gmail credentials are unavailable.')
+
+
+class FailingTransport(EmailTransport):
+    """Email transport rejecting every email"""
+    def send(self, recipient, subject, body_html):
+        """Fail like an unreachable mail server"""
+        raise ConnectionError('Mail server is unreachable.')
+
+
+async def queue_emails(sessions, count: int):
+    """Add emails to the outbox in one transaction"""
+    async with sessions() as db_session:
+        for indx in range(count):
+            queue_message(
+                db_session, f'user{indx}@example.com', 'Hello', '<p>Hi</p>')
+        await db_session.commit()
+
+
+async def outbox_rows(sessions):
+    """Get all outbox rows in insertion order"""
+    async with sessions() as db_session:
+        return (await db_session.scalars(
+            select(EmailOutbox).order_by(EmailOutbox.id))).all()
+
+
+async def make_due(sessions):
+    """Make every pending email due now"""
+    async with sessions() as db_session:
+        await db_session.execute(update(EmailOutbox).values(
+            next_attempt_on=func.now()))
+        await db_session.commit()
+
+
+def use_outbox(monkeypatch, sessions, transport):
+    """Point the delivery worker to the test schema and a transport"""
+    monkeypatch.setattr(
+        email_outbox, 'get_async_session_factory', lambda: sessions)
+    monkeypatch.setattr(email_outbox, 'get_transport', lambda: transport)
+
+
+def test_gmail_service_failure_fails_each_email():
+    """A client that cannot be built fails every email of a batch"""
+    errors = UnavailableGmail().send_many([
+        ('a@example.com', 'Hello', '<p>Hi</p>'),
+        ('b@example.com', 'Hello', '<p>Hi</p>')
+    ])
+    assert len(errors) == 2
+    assert all(isinstance(ex, RuntimeError) for ex in errors)
+
+
+def test_gmail_service_failure_backs_off(monkeypatch, schema_sessions):
+    """Emails of a batch whose client fails are retried later"""
+    use_outbox(monkeypatch, schema_sessions, UnavailableGmail())
+    asyncio.run(queue_emails(schema_sessions, 2))
+    queued_rows = asyncio.run(outbox_rows(schema_sessions))
+    assert asyncio.run(email_delivery.deliver_batch(20)) == 2
+    for queued, row in zip(queued_rows,
+                           asyncio.run(outbox_rows(schema_sessions))):
+        assert row.status == 'pending'
+        assert row.attempts == 1
+        assert row.next_attempt_on > queued.next_attempt_on
+        assert row.next_attempt_on > datetime.now(timezone.utc)
+        assert 'credentials' in row.last_error
+
+
+def test_file_transport_delivery(monkeypatch, schema_sessions, tmp_path):
+    """A queued email is written by the file transport and marked sent"""
+    monkeypatch.setenv('EMAIL_TRANSPORT', 'file')
+    monkeypatch.setenv('EMAIL_FILE_DIR', str(tmp_path))
+    get_transport.cache_clear()
+    try:
+        monkeypatch.setattr(
+            email_outbox, 'get_async_session_factory', lambda: schema_sessions)
+        asyncio.run(queue_emails(schema_sessions, 1))
+        assert asyncio.run(email_delivery.deliver_batch(20)) == 1
+    finally:
+        get_transport.cache_clear()
+    email_files = list(tmp_path.glob('*.eml'))
+    assert len(email_files) == 1
+    assert 'user0@example.com' in email_files[0].read_text()
+    row = asyncio.run(outbox_rows(schema_sessions))[0]
+    assert row.status == 'sent'
+    assert row.sent_on is not None
+    assert asyncio.run(email_delivery.deliver_batch(20)) == 0
+
+
+def test_failing_transport_dead_letters(monkeypatch, schema_sessions):
+    """Failed emails back off and die after EMAIL_MAX_ATTEMPTS"""
+    monkeypatch.setenv('EMAIL_MAX_ATTEMPTS', '3')
+    monkeypatch.setenv('EMAIL_RETRY_BASE_SECONDS', '30')
+    monkeypatch.setenv('EMAIL_RETRY_MAX_SECONDS', '3600')
+    use_outbox(monkeypatch, schema_sessions, FailingTransport())
+    asyncio.run(queue_emails(schema_sessions, 1))
+    for attempts in (1, 2):
+        started = datetime.now(timezone.utc)
+        assert asyncio.run(email_delivery.deliver_batch(20)) == 1
+        row = asyncio.run(outbox_rows(schema_sessions))[0]
+        assert row.status == 'pending'
+        assert row.attempts == attempts
+        assert 'unreachable' in row.last_error
+        assert row.next_attempt_on >= started + timedelta(
+            seconds=30 * 2 ** (attempts - 1))
+        assert asyncio.run(email_delivery.deliver_batch(20)) == 0
+        asyncio.run(make_due(schema_sessions))
+    assert asyncio.run(email_delivery.deliver_batch(20)) == 1
+    row = asyncio.run(outbox_rows(schema_sessions))[0]
+    assert row.status == 'dead'
+    assert row.attempts == 3
+    asyncio.run(make_due(schema_sessions))
+    assert asyncio.run(email_delivery.deliver_batch(20)) == 0
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+"""Module for checking that endpoint queries are planned on indexes"""
+import os
+import uuid
+import pytest
+
+if not os.getenv('TEST_DATABASE_URL'):
+    pytest.skip('TEST_DATABASE_URL is not set.', allow_module_level=True)
+
+from sqlalchemy import and_, create_engine, select
+
+from api.v1.database import (
+    Base,
+    Comment,
+    Post,
+    PostLike,
+    PostScore,
+    Timeline,
+    UserFollowing
+)
+from api.v1.utils.navigation import keyset_select
+from api.v1.utils.trending import unfollowed_condition
+from api.v1.utils.comment_threads import nested_replies_query
+from api.v1.utils.hybrid_feed import recent_posts_query
+from api.v1.utils.post_cards import post_rows_query, liked_ids_query
+from api.v1.utils.user_summaries import summaries_query
+from api.v1.endpoints.search import search_posts_query, search_users_query
+from api.v1.endpoints.connection import connections_query
+from api.v1.endpoints.user import profile_query
+
+
+USERS_COUNT = 20000
+POSTS_COUNT = 100000
+"""Seeded rows, large enough for the planner to prefer indexes"""
+
+PROBE_USER = 'u42'
+PROBE_VIEWER = 'u7'
+PROBE_POST = 'p42'
+PROBE_COMMENT = 'c42'
+
+SEED_STATEMENTS = [
+    f'''INSERT INTO users (id, created_on, updated_on, email, name, bio,
+        profile_picture_id, hashed_password, signin_attempts,
+        token_version, user_active, user_reset_token)
+    SELECT 'u' || i, now() - i * interval '1 minute', now(),
+        'u' || i || '@example.com', 'name' || i, '', '', 'x', 0, 0,
+        true, ''
+    FROM generate_series(0, {USERS_COUNT - 1}) AS i''',
+    f'''INSERT INTO user_stats (user_id, followers_count, followings_count,
+        posts_count, likes_count, comments_count, updated_on)
+    SELECT 'u' || i, 10, 10, 5, 10, 5, now()
+    FROM generate_series(0, {USERS_COUNT - 1}) AS i''',
+    f'''INSERT INTO posts (id, created_on, updated_on, user_id, title,
+        content, likes_count, comments_count)
+    SELECT 'p' || i, now() - i * interval '1 minute', now(),
+        'u' || (i % {USERS_COUNT}), 'title ' || i, 'story w' || i, 2, 1
+    FROM generate_series(0, {POSTS_COUNT - 1}) AS i''',
+    f'''INSERT INTO posts_likes (id, created_on, updated_on, post_id,
+        user_id)
+    SELECT 'l' || i, now() - i * interval '1 second', now(),
+        'p' || ((i / {USERS_COUNT} * 9973 + i) % {POSTS_COUNT}),
+        'u' || (i % {USERS_COUNT})
+    FROM generate_series(0, {POSTS_COUNT * 2 - 1}) AS i''',
+    f'''INSERT INTO users_followings (id, created_on, follower_id,
+        following_id)
+    SELECT 'f' || i, now() - i * interval '1 second',
+        'u' || (i % {USERS_COUNT}),
+        'u' || ((i / {USERS_COUNT} * 211 + i + 1) % {USERS_COUNT})
+    FROM generate_series(0, {USERS_COUNT * 10 - 1}) AS i''',
+    f'''INSERT INTO comments (id, created_on, post_id, user_id,
+        comment_id, content, replies_count)
+    SELECT 'c' || i, now() - i * interval '1 second',
+        'p' || (i * 2 % {POSTS_COUNT}), 'u' || (i % {USERS_COUNT}),
+        NULL, 'comment ' || i, 1
+    FROM generate_series(0, {POSTS_COUNT // 2 - 1}) AS i''',
+    f'''INSERT INTO comments (id, created_on, post_id, user_id,
+        comment_id, content, replies_count)
+    SELECT 'r' || i, now() - i * interval '1 second',
+        'p' || (i * 2 % {POSTS_COUNT}), 'u' || ((i + 1) % {USERS_COUNT}),
+        'c' || i, 'reply ' || i, 0
+    FROM generate_series(0, {POSTS_COUNT // 2 - 1}) AS i''',
+    f'''INSERT INTO post_scores (post_id, author_id, score, created_on,
+        updated_on)
+    SELECT 'p' || i, 'u' || (i % {USERS_COUNT}), random(), now(), now()
+    FROM generate_series(0, {POSTS_COUNT // 10 - 1}) AS i''',
+    f'''INSERT INTO timelines (viewer_id, post_id, author_id, created_on)
+    SELECT 'u' || (i % {USERS_COUNT}),
+        'p' || ((i / {USERS_COUNT} * 7919 + i) % {POSTS_COUNT}),
+        'u' || ((i / {USERS_COUNT} * 7919 + i) % {POSTS_COUNT}
+            % {USERS_COUNT}),
+        now() - i * interval '1 second'
+    FROM generate_series(0, {USERS_COUNT * 10 - 1}) AS i''',
+    'ANALYZE'
+]
+"""Statements filling the test schema with generated rows"""
+
+
+def plan_checks():
+    """Create endpoint queries with the tables they must not seq scan"""
+    page_posts = [f'p{i}' for i in range(42, 54)]
+    checks = [
+        ('posts-user-made', ['posts'], keyset_select(
+            select(Post.id, Post.created_on).where(
+                Post.user_id == PROBE_USER),
+            Post.created_on, Post.id, 12
+        )),
+        ('posts-user-likes', ['posts_likes'], keyset_select(
+            select(PostLike.id, PostLike.post_id).where(
+                PostLike.user_id == PROBE_USER),
+            PostLike.created_on, PostLike.id, 12
+        )),
+        ('posts-feed', ['timelines'], keyset_select(
+            select(Timeline.created_on, Timeline.post_id).where(
+                Timeline.viewer_id == PROBE_VIEWER),
+            Timeline.created_on, Timeline.post_id, 12
+        )),
+        ('posts-feed-pulled', ['posts'],
+         recent_posts_query([PROBE_USER, 'u43', 'u44'], 200)),
+        ('posts-explore', ['post_scores', 'users_followings'], keyset_select(
+            select(PostScore.post_id, PostScore.score).where(
+                unfollowed_condition(PROBE_VIEWER)),
+            PostScore.score, PostScore.post_id, 48
+        )),
+        ('posts/like-status', ['posts', 'posts_likes'], select(
+            Post.id, Post.likes_count, PostLike.id
+        ).outerjoin(PostLike, and_(
+            PostLike.post_id == Post.id,
+            PostLike.user_id == PROBE_VIEWER
+        )).where(Post.id.in_(page_posts))),
+        ('hydrate-posts', ['posts'], post_rows_query(page_posts)),
+        ('hydrate-liked', ['posts_likes'],
+         liked_ids_query(PROBE_VIEWER, page_posts)),
+        ('hydrate-authors', ['users'],
+         summaries_query([f'u{i}' for i in range(42, 54)])),
+        ('search-posts', ['posts'], search_posts_query('w4242', 12)),
+        ('search-people', ['users'], search_users_query('name4242', 12)),
+        ('comments-of-post', ['comments'], keyset_select(
+            select(Comment.id).where(and_(
+                Comment.post_id == PROBE_POST,
+                Comment.comment_id == None
+            )),
+            Comment.created_on, Comment.id, 12, descending=False
+        )),
+        ('comment-replies', ['comments'], keyset_select(
+            select(Comment.id).where(Comment.comment_id == PROBE_COMMENT),
+            Comment.created_on, Comment.id, 12, descending=False
+        )),
+        ('comments-by-user', ['comments'], keyset_select(
+            select(Comment.id).where(Comment.user_id == PROBE_USER),
+            Comment.created_on, Comment.id, 12, descending=False
+        )),
+        ('comment-thread', ['comments'],
+         nested_replies_query([PROBE_COMMENT], 3)),
+        ('followers', ['users_followings'], connections_query(
+            UserFollowing.following_id, UserFollowing.follower_id,
+            PROBE_USER, PROBE_VIEWER, 12
+        )),
+        ('followings', ['users_followings'], connections_query(
+            UserFollowing.follower_id, UserFollowing.following_id,
+            PROBE_USER, PROBE_VIEWER, 12
+        )),
+        ('follow-graph', ['users_followings'], select(
+            UserFollowing.follower_id, UserFollowing.following_id
+        ).where(UserFollowing.follower_id.in_([PROBE_USER, PROBE_VIEWER]))),
+        ('user-profile', ['users', 'user_stats'], profile_query(PROBE_USER))
+    ]
+    return checks
+
+
+def seq_scanned_tables(plan: dict):
+    """Get tables read with a sequential scan anywhere in a plan"""
+    tables = set()
+    if plan.get('Node Type') == 'Seq Scan':
+        tables.add(plan.get('Relation Name'))
+    for sub_plan in plan.get('Plans', []):
+        tables |= seq_scanned_tables(sub_plan)
+    return tables
+
+
+@pytest.fixture(scope='module')
+def seeded_engine():
+    """Create tables in a throwaway schema and fill them with rows"""
+    db_url = os.getenv('TEST_DATABASE_URL')
+    schema = f'plan_check_{uuid.uuid4().hex[:12]}'
+    admin_engine = create_engine(db_url)
+    with admin_engine.begin() as conn:
+        conn.exec_driver_sql(f'CREATE SCHEMA {schema}')
+    engine = create_engine(
+        db_url, connect_args={'options': f'-csearch_path={schema}'})
+    try:
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for seed_stmt in SEED_STATEMENTS:
+                conn.exec_driver_sql(seed_stmt)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin_engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP SCHEMA {schema} CASCADE')
+        admin_engine.dispose()
+
+
+@pytest.mark.parametrize(
+    'name, tables, stmt', plan_checks(), ids=[x[0] for x in plan_checks()])
+def test_query_uses_indexes(seeded_engine, name, tables, stmt):
+    """Endpoint queries read the checked tables without seq scans"""
+    compiled = stmt.compile(
+        dialect=seeded_engine.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    with seeded_engine.connect() as conn:
+        query_plan = conn.exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+        ).scalar()
+    scanned = seq_scanned_tables(query_plan[0]['Plan']) & set(tables)
+    assert not scanned, f'{name} seq scans {", ".join(sorted(scanned))}'
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""Module for checking reset token round trips"""
+import uuid
+import asyncio
+import pytest
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from cryptography.fernet import Fernet
+
+from api.v1.utils.token_management import ResetTokenMngr
+
+
+class UserSession:
+    """Session stand-in returning one user for any scalar query"""
+    def __init__(self, user):
+        """Initializing UserSession class"""
+        self.user = user
+
+    async def scalar(self, stmt):
+        """Get the user of the session"""
+        return self.user
+
+
+@pytest.fixture
+def reset_user(monkeypatch):
+    """Create an active user and a fresh app secret key"""
+    monkeypatch.delenv('APP_SECRET_KEYS', raising=False)
+    monkeypatch.setenv('APP_SECRET_KEY', Fernet.generate_key().decode())
+    return SimpleNamespace(
+        id=str(uuid.uuid4()), email='reset@example.com', user_active=True)
+
+
+def test_reset_token_round_trip(reset_user):
+    """A reset token converts back to its user, email and message"""
+    reset_token_str = ResetTokenMngr.encode_token(ResetTokenMngr(
+        user_id=reset_user.id,
+        email=reset_user.email,
+        message='password_reset'
+    ))
+    assert reset_token_str
+    reset_token = asyncio.run(ResetTokenMngr.convert_token(
+        reset_token_str, UserSession(reset_user)))
+    assert reset_token is not None
+    assert reset_token.user_id == reset_user.id
+    assert reset_token.email == reset_user.email
+    assert reset_token.message == 'password_reset'
+    assert not reset_token.has_expired()
+
+
+def test_reset_token_of_changed_email(reset_user):
+    """A reset token is rejected once the user email changed"""
+    reset_token_str = ResetTokenMngr.encode_token(ResetTokenMngr(
+        user_id=reset_user.id,
+        email=reset_user.email,
+        message='password_reset'
+    ))
+    reset_user.email = 'changed@example.com'
+    assert asyncio.run(ResetTokenMngr.convert_token(
+        reset_token_str, UserSession(reset_user))) is None
+
+
+def test_reset_token_has_expired():
+    """A reset token past its expiry reports it"""
+    reset_token = ResetTokenMngr(
+        user_id='user', email='reset@example.com', message='password_reset',
+        expires=(datetime.utcnow() - timedelta(minutes=1)).isoformat()
+    )
+    assert reset_token.has_expired()